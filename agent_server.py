@@ -1,12 +1,20 @@
-from typing import Protocol, runtime_checkable, Dict, Any, List 
-from fastapi import FastAPI, HTTPException, Body
+from contextlib import asynccontextmanager
+from typing import Protocol, runtime_checkable, Dict, Any, Iterator, List, Optional
+from fastapi import APIRouter, FastAPI, HTTPException, Body, Header
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import ValidationError
-from schemas.messages import AgentMessage
 import logging
 import os
 from schemas.messages import Messages, UserMessage, AgentMessage
+from schemas.inventory import BatchInventoryRequest
 import traceback
-import json
+from services import jsonlib
+from services.circuit_breaker import default_breakers as circuit_breakers
+from services.idempotency import (
+    IdempotencyConflictError, fingerprint as idempotency_fingerprint, request_store as idempotency_store,
+)
+from services.jobs import default_queue as job_queue
 logging.basicConfig(
     level=os.getenv("LOG_LEVEL", "INFO"),
     format="%(asctime)s | %(name)s | %(message)s",
@@ -14,6 +22,28 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Responses at least this large are gzip-compressed for clients that accept it (0 disables compression)
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1024"))
+# Streamed NDJSON routes (under any agent prefix), sent uncompressed: GZipMiddleware may buffer streamed
+# bodies in the compressor (it does in starlette 0.46), which would hold back the lines
+UNCOMPRESSED_PATHS = ("/api/inventory/batch", "/api/sendMessage/stream")
+
+
+class _CompressionMiddleware:
+    """
+    GZipMiddleware for every route except the streamed UNCOMPRESSED_PATHS.
+    """
+
+    def __init__(self, app: Any, minimum_size: int):
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] == "http" and scope["path"].endswith(UNCOMPRESSED_PATHS):
+            await self.app(scope, receive, send)
+        else:
+            await self.gzip(scope, receive, send)
+
 @runtime_checkable            
 class AgentProtocol(Protocol):
     """Any agent that can respond to a chat."""
@@ -21,7 +51,46 @@ class AgentProtocol(Protocol):
     # (If you add more required methods later, this check auto-updates.)
 
 
-def create_chat_app(agent: AgentProtocol) -> FastAPI:
+@runtime_checkable
+class TypedAgentProtocol(Protocol):
+    """
+    Optional fast path: an agent that consumes the validated Messages model directly,
+    so the server does not have to dump the request back into dicts.
+    """
+    def invoke_typed(self, messages: Messages) -> AgentMessage: ...
+
+
+@runtime_checkable
+class BatchInventoryProtocol(Protocol):
+    """
+    Optional: an agent that can fetch the inventories of many tenants in one request,
+    yielding one result per tenant as it completes.
+    """
+    def stream_inventory(self, tenants: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]: ...
+
+
+@runtime_checkable
+class StreamingAgentProtocol(Protocol):
+    """
+    Optional: an agent that can report progress while it works (e.g. the output of a
+    running command), ending with the final message event.
+    """
+    def invoke_stream(self, messages: Dict[str, List[Dict[str, Any]]]) -> Iterator[Dict[str, Any]]: ...
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with the configured fast JSON backend (orjson when available)."""
+    def render(self, content: Any) -> bytes:
+        return jsonlib.dumps(content)
+
+
+def _log_json(title: str, payload: Any) -> None:
+    # Pretty-printing long histories is expensive, only do it when it will be emitted
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("%s\n%s", title, jsonlib.dumps(payload, indent=True).decode("utf-8"))
+
+
+def _check_agent(agent: AgentProtocol) -> None:
     # ONE-LINER guardrail — fails fast if agent doesn’t meet the protocol
     if not isinstance(agent, AgentProtocol):
         raise TypeError(
@@ -29,52 +98,149 @@ def create_chat_app(agent: AgentProtocol) -> FastAPI:
             "(missing .invoke(messages: Messages) -> Message, perhaps?)"
         )
 
-    app = FastAPI(title="DuploCloud Chat Service", version="0.1.0")
+
+def _create_app(agents: List[AgentProtocol]) -> FastAPI:
+    """
+    The FastAPI app with the routes shared by every agent (health, jobs) and a lifespan
+    that runs the background work of each agent.
+    """
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Agents may run background work (schedulers, syncers) for the lifetime of the server
+        started = []
+        try:
+            for agent in agents:
+                if hasattr(agent, "start_background"):
+                    agent.start_background()
+                started.append(agent)
+            yield
+        finally:
+            for agent in reversed(started):
+                if hasattr(agent, "stop_background"):
+                    agent.stop_background()
+
+    app = FastAPI(
+        title="DuploCloud Chat Service",
+        version="0.1.0",
+        default_response_class=FastJSONResponse,
+        lifespan=lifespan,
+    )
+    if GZIP_MINIMUM_SIZE > 0:
+        app.add_middleware(_CompressionMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
 
     # ----- health check ------------------------------------------------------
     @app.get("/health", tags=["system"])
-    def health() -> Dict[str, str]:
-        return {"status": "ok"}
+    def health() -> Dict[str, Any]:
+        # The service itself is up; "degraded" reports upstream Duplo endpoints failing fast
+        breakers = circuit_breakers.health()
+        degraded = any(breaker["state"] != "closed" for breaker in breakers)
+        return {"status": "degraded" if degraded else "ok", "duplo_api": breakers}
+
+    # ----- background jobs ---------------------------------------------------
+    @app.get("/api/jobs/{job_id}", tags=["jobs"])
+    def get_job(job_id: str) -> FastJSONResponse:
+        job = job_queue.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+        return FastJSONResponse(job.to_dict())
+
+    return app
+
+
+def _agent_router(agent: AgentProtocol, prefix: str = "") -> APIRouter:
+    """
+    The chat (and, when supported, batch inventory) routes of one agent.
+    """
+    _check_agent(agent)
+    # Resolved once here rather than with a runtime protocol check on every request
+    typed_agent = isinstance(agent, TypedAgentProtocol)
+    router = APIRouter(prefix=prefix)
+
+    # ----- multi-tenant inventory ---------------------------------------------
+    if isinstance(agent, BatchInventoryProtocol):
+        @router.post("/api/inventory/batch", tags=["inventory"])
+        def batch_inventory(request: BatchInventoryRequest) -> StreamingResponse:
+            tenants = [tenant.model_dump() for tenant in request.tenants]
+            logger.info("Batch inventory requested for %d tenants", len(tenants))
+
+            # Newline-delimited JSON, one line per tenant in completion order
+            def lines() -> Iterator[bytes]:
+                for result in agent.stream_inventory(tenants):
+                    yield jsonlib.dumps(result) + b"\n"
+
+            return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    # ----- streaming chat endpoint -------------------------------------------
+    if isinstance(agent, StreamingAgentProtocol):
+        @router.post("/api/sendMessage/stream", tags=["chat"])
+        def send_message_stream(raw_body: Dict[str, Any] = Body(...)) -> StreamingResponse:
+            if "messages" not in raw_body:
+                raise HTTPException(status_code=400,
+                                    detail="'messages' field missing from request body")
+            try:
+                msgs_dict = Messages.model_validate({"messages": raw_body["messages"]}).model_dump()
+            except ValidationError as ve:
+                raise HTTPException(status_code=400, detail=str(ve))
+
+            # Newline-delimited JSON progress events, the last one carries the agent's message
+            def lines() -> Iterator[bytes]:
+                for event in agent.invoke_stream(msgs_dict):
+                    yield jsonlib.dumps(event) + b"\n"
+
+            return StreamingResponse(lines(), media_type="application/x-ndjson")
 
     # ----- chat endpoint -----------------------------------------------------
-    @app.post("/api/sendMessage", response_model=AgentMessage, tags=["chat"])
-    def send_message(raw_body: Dict[str, Any] = Body(...)) -> AgentMessage:
+    @router.post("/api/sendMessage", response_model=AgentMessage, tags=["chat"])
+    def send_message(raw_body: Dict[str, Any] = Body(...),
+                     idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")) -> Response:
         # Log request details with JSON formatting
-        logger.info(f"\nRequest Details:\nURL: /api/sendMessage\nMethod: POST\nRequest Body:\n{json.dumps(raw_body, indent=2)}")
+        _log_json(f"\nRequest Details:\nURL: {prefix}/api/sendMessage\nMethod: POST\nRequest Body:", raw_body)
 
         # 1. validate presence of 'messages'
         if "messages" not in raw_body:
             raise HTTPException(status_code=400,
                                 detail="'messages' field missing from request body")
 
+        if not idempotency_key:
+            return _json_response(_respond(raw_body))
+
+        # A retried request (same key and body) gets the original response instead of running the agent again
         try:
-            # Parse request messages
-            msgs_obj = Messages.model_validate({"messages": raw_body["messages"]})
-            
-            # Convert to dict and pass to agent
-            msgs_dict = msgs_obj.model_dump()
-            logger.info(f"Invoking agent with messages: {json.dumps(msgs_dict, indent=2)}")
-            assistant_msg = agent.invoke(msgs_dict)
-            
-            # Create response with platform context
-            response_msg = AgentMessage(
-                role="assistant",
-                content=assistant_msg.content,
-                data=assistant_msg.data,
-                timestamp=assistant_msg.timestamp,
-                user=assistant_msg.user,
-                agent=assistant_msg.agent,
+            response_json, age = idempotency_store.run(
+                f"{prefix}:{idempotency_key}", lambda: _respond(raw_body), idempotency_fingerprint(raw_body)
             )
+        except IdempotencyConflictError:
+            raise HTTPException(status_code=422,
+                                detail=f"Idempotency-Key {idempotency_key} was already used for a different request")
+        if age is None:
+            return _json_response(response_json)
+        logger.info("Replaying response of idempotency key %s (%.0fs old)", idempotency_key, age)
+        return _json_response(response_json, headers={"Idempotent-Replayed": "true"})
 
-            # Log and return response with platform context
-            response_dict = response_msg.model_dump()
-            logger.info(f"\nResponse Details:\nStatus: Success\nResponse Body:\n{json.dumps(response_dict, indent=2)}")
-            return response_msg
+    def _json_response(response_json: str, headers: Optional[Dict[str, str]] = None) -> Response:
+        return Response(content=response_json, media_type="application/json", headers=headers)
 
-            # Still validate the response format
-            assistant_msg = AgentMessage.model_validate(assistant_msg)  # schema guardrail
+    def _respond(raw_body: Dict[str, Any]) -> str:
+        try:
+            # Parse request messages (validated once, shared with the agent)
+            msgs_obj = Messages.model_validate({"messages": raw_body["messages"]})
 
-            return assistant_msg
+            if typed_agent:
+                assistant_msg = agent.invoke_typed(msgs_obj)
+            else:
+                # Convert to dict and pass to agent
+                msgs_dict = msgs_obj.model_dump()
+                _log_json("Invoking agent with messages:", msgs_dict)
+                assistant_msg = agent.invoke(msgs_dict)
+
+            # Still validate the response format, agents normally hand back an AgentMessage already
+            if not isinstance(assistant_msg, AgentMessage):
+                assistant_msg = AgentMessage.model_validate(assistant_msg)  # schema guardrail
+
+            # Log and return the agent's message, encoded to JSON exactly once
+            response_json = assistant_msg.model_dump_json()
+            logger.info("\nResponse Details:\nStatus: Success\nResponse Body:\n%s", response_json)
+            return response_json
 
         except ValidationError as ve:
             logger.error("Validation error in agent: %s", ve)
@@ -86,4 +252,34 @@ def create_chat_app(agent: AgentProtocol) -> FastAPI:
             logger.error("Unhandled exception in agent:\n%s", traceback_error)
             raise HTTPException(status_code=500, detail=str(e))
 
+    return router
+
+
+def create_chat_app(agent: AgentProtocol) -> FastAPI:
+    _check_agent(agent)
+    app = _create_app([agent])
+    app.include_router(_agent_router(agent))
+    return app
+
+
+def create_multi_agent_app(agents: Dict[str, AgentProtocol], default: Optional[str] = None) -> FastAPI:
+    """
+    Serve several agents from one app, each under /agents/{name} (e.g. /agents/cmd/api/sendMessage).
+
+    Args:
+        agents: Agent name -> agent
+        default: Agent also served at the unprefixed routes, for existing clients
+    """
+    for agent in agents.values():
+        _check_agent(agent)
+    app = _create_app(list(agents.values()))
+    for name, agent in agents.items():
+        app.include_router(_agent_router(agent, prefix=f"/agents/{name}"))
+    if default is not None:
+        app.include_router(_agent_router(agents[default]))
+
+    @app.get("/agents", tags=["system"])
+    def list_agents() -> Dict[str, Any]:
+        return {"agents": list(agents), "default": default}
+
     return app
@@ -0,0 +1,56 @@
+"""
+Agent registry.
+
+Agents are imported on demand by name so the server only loads the modules
+(and dependencies) of the agents it actually runs. Select them with AGENT,
+a comma-separated list; agents served together share one LLM client.
+"""
+import importlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from agent_server import AgentProtocol
+
+# name -> (module, class, takes a BedrockAnthropicLLM)
+AGENTS: Dict[str, Tuple[str, str, bool]] = {
+    "cost_optimiser": ("agents.cost_optimiser_agent", "CostOptimiserAgent", True),
+    "echo": ("agents.echo_agent", "EchoAgent", False),
+    "llm_passthrough": ("agents.llm_passthrough_agent", "LLMPassthroughAgent", True),
+    "cmd": ("agents.cmd_agent", "CommandAgent", True),
+    "boilerplate": ("agents.boilerplate_agent", "BoilerplateAgent", False),
+}
+
+DEFAULT_AGENT = "cost_optimiser"
+
+
+def load_agent(name: str = DEFAULT_AGENT, llm: Optional[Any] = None) -> AgentProtocol:
+    """
+    Import and construct the agent registered under name.
+
+    Args:
+        name: Registered agent name
+        llm: BedrockAnthropicLLM handed to agents that need one (a new one when None)
+
+    Raises:
+        ValueError: If no agent is registered under name
+    """
+    if name not in AGENTS:
+        raise ValueError(f"Unknown agent {name!r}, expected one of: {', '.join(AGENTS)}")
+    module_name, class_name, needs_llm = AGENTS[name]
+    agent_class = getattr(importlib.import_module(module_name), class_name)
+    if needs_llm:
+        if llm is None:
+            from services.llm import BedrockAnthropicLLM
+            llm = BedrockAnthropicLLM()
+        return agent_class(llm)
+    return agent_class()
+
+
+def load_agents(names: List[str]) -> Dict[str, AgentProtocol]:
+    """
+    Construct several agents sharing a single LLM client, keyed by name.
+    """
+    llm = None
+    if any(AGENTS.get(name, ("", "", False))[2] for name in names):
+        from services.llm import BedrockAnthropicLLM
+        llm = BedrockAnthropicLLM()
+    return {name: load_agent(name, llm=llm) for name in names}
@@ -3,16 +3,33 @@ import json
 import logging
 import traceback
 
-import subprocess
 import os
-from typing import List, Dict, Any, Optional
+import queue
+import threading
+from typing import List, Dict, Any, Callable, Iterator, Optional
 
 from agent_server import AgentProtocol
-from schemas.messages import AgentMessage, Command, ExecutedCommand, Data
+from schemas.messages import AgentMessage, Command, ExecutedCommand, Data, Messages
+from services.command_cache import default_cache as command_cache, is_cacheable
+from services.command_runner import COMMAND_PARALLEL_WORKERS, default_pool, is_read_only, run_command
 from services.llm import BedrockAnthropicLLM
 
 logger = logging.getLogger(__name__)
 
+# Characters of a command output from an earlier turn embedded in the prompt (0 = unlimited)
+COMMAND_HISTORY_OUTPUT_CHARS = int(os.getenv("COMMAND_HISTORY_OUTPUT_CHARS", "4000"))
+# Characters of earlier command outputs embedded in one prompt, newest first (0 = unlimited)
+COMMAND_HISTORY_TOTAL_CHARS = int(os.getenv("COMMAND_HISTORY_TOTAL_CHARS", "64000"))
+
+
+def _clip_output(output: str, limit: int) -> str:
+    """Keep the head and tail of an output longer than limit characters."""
+    if not limit or len(output) <= limit:
+        return output
+    half = limit // 2
+    return f"{output[:half]}\n... [{len(output) - 2 * half} characters omitted] ...\n{output[-half:]}"
+
+
 class CommandAgent(AgentProtocol):
     """
     An agent that processes user messages, executes terminal commands with user approval,
@@ -31,19 +48,32 @@ class CommandAgent(AgentProtocol):
         self.system_prompt = system_prompt or self._default_system_prompt()
         self.response_schema = self._create_response_schema()
     
-    def invoke(self, messages: Dict[str, List[Dict[str, Any]]]) -> AgentMessage:
+    def invoke(self, messages: Dict[str, List[Dict[str, Any]]],
+               progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> AgentMessage:
         """
         Process user messages, execute commands if approved, and generate a response.
         
         Args:
             messages: A dictionary containing message history in the format {"messages": [...]}
+            progress: Optional callback receiving command progress events (see execute_cmd)
             
         Returns:
             An AgentMessage containing the response, suggested commands, and executed commands
         """
         # Process messages to handle command execution and prepare for LLM
-        processed_messages, executed_commands = self.process_messages(messages)
-        
+        processed_messages, executed_commands = self.process_messages(messages, progress)
+        return self._respond(processed_messages, executed_commands)
+    
+    def invoke_typed(self, messages: Messages,
+                     progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> AgentMessage:
+        """
+        Same as invoke, reading the validated models directly.
+        """
+        processed_messages, executed_commands = self.process_typed_messages(messages, progress)
+        return self._respond(processed_messages, executed_commands)
+    
+    def _respond(self, processed_messages: List[Dict[str, Any]],
+                 executed_commands: List[Dict[str, str]]) -> AgentMessage:
         # Generate response from LLM
         llm_response = self.call_llm(processed_messages)
         
@@ -54,74 +84,171 @@ class CommandAgent(AgentProtocol):
         return AgentMessage(
             content=llm_response.get("content", "I'm unable to provide a response at this time."),
             data=Data(
-                cmds=[Command(command=cmd["command"]) for cmd in commands],
+                cmds=[Command(command=cmd["command"], independent=cmd.get("independent", False))
+                      for cmd in commands],
                 executed_cmds=[ExecutedCommand(command=cmd["command"], output=cmd["output"]) 
                               for cmd in executed_commands]
             )
         )
     
-    def process_messages(self, messages: Dict[str, List[Dict[str, Any]]]) -> tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
+    def invoke_stream(self, messages: Dict[str, List[Dict[str, Any]]]) -> Iterator[Dict[str, Any]]:
+        """
+        Like invoke, but yields command progress events while approved commands run.
+        
+        Args:
+            messages: A dictionary containing message history in the format {"messages": [...]}
+            
+        Returns:
+            An iterator of events; the last one is {"type": "message", "message": ...}
+            or {"type": "error", "detail": ...}
+        """
+        events: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        outcome: Dict[str, Any] = {}
+        
+        def run() -> None:
+            try:
+                outcome["message"] = self.invoke(messages, progress=events.put)
+            except Exception as e:
+                logger.error(f"Error while streaming command agent response: {e}")
+                outcome["error"] = str(e)
+            finally:
+                events.put(None)
+        
+        threading.Thread(target=run, name="cmd-agent-stream", daemon=True).start()
+        while (event := events.get()) is not None:
+            yield event
+        
+        if "error" in outcome:
+            yield {"type": "error", "detail": outcome["error"]}
+        else:
+            yield {"type": "message", "message": outcome["message"].model_dump(mode="json")}
+    
+    def process_messages(self, messages: Dict[str, List[Dict[str, Any]]],
+                         progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
         """
         Process the raw messages to handle command execution and prepare for LLM.
         
         Args:
             messages: A dictionary containing message history in the format {"messages": [...]}
+            progress: Optional callback receiving command progress events
             
         Returns:
             A tuple containing:
             - A list of processed messages ready for the LLM
             - A list of executed commands with their outputs
         """
+        history = []
+        for msg in messages.get("messages", []):
+            data = msg.get("data", {})
+            history.append((
+                msg.get("role"),
+                msg.get("content", ""),
+                data.get("cmds") or [],
+                [(cmd["command"], cmd["output"]) for cmd in data.get("executed_cmds") or []],
+            ))
+        return self._process_history(history, progress)
+    
+    def process_typed_messages(self, messages: Messages,
+                               progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
+        """
+        Same as process_messages, reading the validated models directly.
+        """
+        last_index = len(messages.messages) - 1
+        history = []
+        for index, msg in enumerate(messages.messages):
+            history.append((
+                msg.role,
+                msg.content,
+                # Only the latest message's commands are executed
+                [cmd.model_dump() for cmd in msg.data.cmds] if index == last_index else [],
+                [(cmd.command, cmd.output) for cmd in msg.data.executed_cmds],
+            ))
+        return self._process_history(history, progress)
+    
+    def _process_history(self, history: List[tuple],
+                         progress: Optional[Callable[[Dict[str, Any]], None]]) -> tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
+        """
+        Shared part of process_messages/process_typed_messages.
+        
+        Args:
+            history: One (role, content, cmds, executed) per message, where cmds are command
+                dictionaries and executed are (command, output) pairs
+            progress: Optional callback receiving command progress events
+        """
         processed_messages = []
         executed_cmds = []
+        # (command, output) pairs already embedded; clients resend the same history every turn.
+        # Messages are walked newest-first so the latest (unclipped) copy of a repeated output is kept.
+        seen_outputs = set()
+        # Remaining room for earlier outputs; only commands run in this turn are embedded in full
+        history_budget = COMMAND_HISTORY_TOTAL_CHARS
         
-        # Extract the messages list from the dictionary
-        messages_list = messages.get("messages", [])
+        last_index = len(history) - 1
         
-        for msg in messages_list:
+        for index in range(last_index, -1, -1):
+            role, content, cmds, executed = history[index]
             # Ensure we're only processing messages with valid roles (user or assistant)
-            role = msg.get("role")
             if role not in ["user", "assistant"]:
                 continue
                 
             # Create a basic message with role and content
-            processed_msg = {"role": role, "content": msg.get("content", "")}
+            content_parts = [content]
+            message_cmds = []
             
             # Process user messages with approved commands
             if role == "user":
-                data = msg.get("data", {})
+                is_latest = index == last_index
                 
                 # Check for commands to execute - only in the current message
-                if "cmds" in data and msg == messages_list[-1]:  # Only check the most recent message
-                    logger.info(f"Processing commands in most recent user message: {data['cmds']}")
-                    for cmd in data["cmds"]:
+                if cmds and is_latest:  # Only check the most recent message
+                    logger.info(f"Processing commands in most recent user message: {cmds}")
+                    approved = []
+                    for cmd in cmds:
                         if cmd.get("execute", False):
                             logger.info(f"Executing approved command: {cmd['command']}")
-                            # Execute the approved command
-                            output = self.execute_cmd(cmd["command"])
-                            
-                            # Track executed commands
-                            executed_cmds.append({
-                                "command": cmd["command"],
-                                "output": output
-                            })
-                            
-                            # Append command output to the message content
-                            cmd_info = f"\n\nExecuted command: {cmd['command']}\nOutput: {output}"
-                            processed_msg["content"] += cmd_info
+                            approved.append(cmd)
                         else:
                             logger.info(f"Skipping command without execute flag: {cmd['command']}")
+                    
+                    # Execute the approved commands, outputs come back in the original order
+                    for cmd, output in zip(approved, self.execute_cmds(approved, progress)):
+                        # Track executed commands
+                        message_cmds.append({
+                            "command": cmd["command"],
+                            "output": output
+                        })
+                        seen_outputs.add((cmd["command"], output))
+                        
+                        # Append command output to the message content
+                        content_parts.append(f"\n\nExecuted command: {cmd['command']}\nOutput: {output}")
                 
-                # Include previously executed commands
-                if "executed_cmds" in data and data["executed_cmds"]:
-                    for cmd in data["executed_cmds"]:
-                        executed_cmds.append(cmd)
-                        cmd_info = f"\n\nPreviously executed: {cmd['command']}\nOutput: {cmd['output']}"
-                        processed_msg["content"] += cmd_info
+                # Include previously executed commands, each distinct output once. They are
+                # walked newest-first too, so the budget goes to the most recent outputs.
+                previous_cmds = []
+                previous_parts = []
+                for key in reversed(executed):
+                    if key in seen_outputs:
+                        continue
+                    seen_outputs.add(key)
+                    command, output = key
+                    previous_cmds.append({"command": command, "output": output})
+                    # Earlier commands only need the gist of their output
+                    clipped = _clip_output(output, COMMAND_HISTORY_OUTPUT_CHARS)
+                    if COMMAND_HISTORY_TOTAL_CHARS and len(clipped) > history_budget:
+                        clipped = f"[{len(output)} characters omitted]"
+                    elif COMMAND_HISTORY_TOTAL_CHARS:
+                        history_budget -= len(clipped)
+                    previous_parts.append(f"\n\nPreviously executed: {command}\nOutput: {clipped}")
+                message_cmds.extend(reversed(previous_cmds))
+                content_parts.extend(reversed(previous_parts))
             
             # Add the processed message to the list
-            processed_messages.append(processed_msg)
+            processed_messages.append({"role": role, "content": "".join(content_parts)})
+            executed_cmds.append(message_cmds)
         
+        # Back to chronological order
+        processed_messages.reverse()
+        executed_cmds = [cmd for message_cmds in reversed(executed_cmds) for cmd in message_cmds]
         return processed_messages, executed_cmds
     
     def call_llm(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -164,39 +291,105 @@ class CommandAgent(AgentProtocol):
             else:
                 raise Exception(f"Error while making LLM API call: {str(e)}")
     
-    def execute_cmd(self, command: str) -> str:
+    def execute_cmds(self, cmds: List[Dict[str, Any]],
+                     progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[str]:
+        """
+        Execute approved commands, running consecutive independent ones concurrently.
+        
+        A command is independent when flagged so or when it is read-only (kubectl get/describe,
+        aws describe-/list-, ...). Any other command waits for the commands before it and
+        blocks the ones after it, so dependent sequences keep their order.
+        
+        Args:
+            cmds: Approved command dictionaries ({"command": ..., "independent": ...})
+            progress: Optional callback receiving command progress events
+            
+        Returns:
+            The output of each command, in the order of cmds
+        """
+        outputs: List[Optional[str]] = [None] * len(cmds)
+        batch: List[int] = []
+        
+        def flush() -> None:
+            if len(batch) > 1 and COMMAND_PARALLEL_WORKERS > 1:
+                futures = [(i, default_pool.submit(self.execute_cmd, cmds[i]["command"], progress)) for i in batch]
+                for i, future in futures:
+                    outputs[i] = future.result()
+            else:
+                for i in batch:
+                    outputs[i] = self.execute_cmd(cmds[i]["command"], progress)
+            batch.clear()
+        
+        for i, cmd in enumerate(cmds):
+            if cmd.get("independent", False) or is_read_only(cmd["command"]):
+                batch.append(i)
+            else:
+                flush()
+                outputs[i] = self.execute_cmd(cmd["command"], progress)
+        flush()
+        return outputs
+    
+    def execute_cmd(self, command: str,
+                    progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> str:
         """
         Execute a terminal command and return its output.
         
+        The command is stopped after COMMAND_TIMEOUT seconds or COMMAND_MAX_OUTPUT_BYTES of
+        output, and only the head and tail of long output are kept. When COMMAND_CACHE_TTL is
+        set, recent results of read-only kubectl/aws commands are reused and marked with their age.
+        
         Args:
             command: The command string to execute
+            progress: Optional callback receiving "command_started", "output" and
+                "command_finished" events while the command runs
             
         Returns:
             The command output as a string
         """
-        try:
-            logger.info(f"Executing command: {command}")
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True
+        on_output = None
+        if progress:
+            progress({"type": "command_started", "command": command})
+            on_output = lambda stream, text: progress(
+                {"type": "output", "command": command, "stream": stream, "text": text}
             )
+        try:
+            age = None
+            if command_cache.enabled and is_cacheable(command):
+                # A run of the same command already in progress is joined, its output so far replayed
+                result, age = command_cache.get_or_run(
+                    command, lambda on_chunk: run_command(command, on_output=on_chunk), on_output=on_output
+                )
+            else:
+                logger.info(f"Executing command: {command}")
+                result = run_command(command, on_output=on_output)
             
-            # Combine stdout and stderr for the output
-            output = result.stdout
-            if result.stderr:
-                if output:
-                    output += f"\n\nErrors:\n{result.stderr}"
-                else:
-                    output = f"Errors:\n{result.stderr}"
-                    
-            if not output:
-                output = "Command executed successfully with no output."
-                
+            if age is not None:
+                logger.info(f"Using cached output ({age:.0f}s old) of command: {command}")
+                if on_output:
+                    # Replay the cached output so streaming clients still see it
+                    for stream in ("stdout", "stderr"):
+                        if getattr(result, stream):
+                            on_output(stream, getattr(result, stream))
+            if progress:
+                progress({
+                    "type": "command_finished",
+                    "command": command,
+                    "exit_code": result.exit_code,
+                    "elapsed": round(result.elapsed, 3),
+                    "timed_out": result.timed_out,
+                    "truncated": result.truncated or result.output_limited,
+                    "cached_age": None if age is None else round(age, 1),
+                })
+            
+            output = result.output_text()
+            if age is not None:
+                # Tell the LLM the output may be stale
+                output = f"[Cached result from {age:.0f}s ago]\n{output}"
             return output
         except Exception as e:
             logger.error(f"Error executing command: {e}")
+            if progress:
+                progress({"type": "command_finished", "command": command, "error": str(e)})
             return f"Error executing command: {str(e)}"
     
     def _extract_commands(self, llm_response: Dict[str, Any]) -> List[Dict[str, str]]:
@@ -236,6 +429,8 @@ class CommandAgent(AgentProtocol):
         5. Provide clear, concise explanations in plain language
         6. If a task cannot be accomplished with terminal commands, explain why and suggest alternatives
         7. Always prioritize safe commands that won't damage the user's system
+        8. Mark a command as independent when it neither needs nor changes the result of the other
+           commands you suggest, so it can run alongside them
         
         Always use the structured response format to organize your suggestions.
         """
@@ -270,6 +465,10 @@ class CommandAgent(AgentProtocol):
                                 "explanation": {
                                     "type": "string",
                                     "description": "A brief explanation of what this command does."
+                                },
+                                "independent": {
+                                    "type": "boolean",
+                                    "description": "True if the command can run concurrently with the other suggested commands."
                                 }
                             },
                             "required": ["command"]
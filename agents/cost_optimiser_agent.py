@@ -1,18 +1,158 @@
 
+import copy
 import json
 import logging
 from queue import Empty
 import subprocess
 import os
-from typing import List, Dict, Any, Optional
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Iterator, List, Dict, Any, Optional
 
 from agent_server import AgentProtocol
-from schemas.messages import AgentMessage
+from schemas.messages import AgentMessage, Data, Messages
+from schemas.resources import AsgRecord, Ec2Record, RdsRecord, ResourceRecord, intern_value
+from services import jsonlib
+from services.batch_inventory import default_fetcher as batch_fetcher
+from services.circuit_breaker import default_breakers as circuit_breakers
 from services.llm import BedrockAnthropicLLM
-import requests
-from urllib3.exceptions import InsecureRequestWarning
+from services.convergence import (
+    CONVERGED, CONVERGENCE_WATCH, REMOVED, ConvergenceEvent, default_tracker as convergence_tracker,
+)
+from services.inventory_sync import default_manager as inventory_sync_manager
+from services.idempotency import action_store
+from services.jobs import FAILED, Job, default_queue as job_queue
+from services.lazy import lazy_import
+from services.resource_store import ResourceStore
+from services.scheduler import ScheduleRule, scheduler_from_env
+from services.singleflight import SingleFlight
 logger = logging.getLogger(__name__)
 
+# Loaded on first use rather than at server startup
+requests = lazy_import("requests")
+http_pool = lazy_import("services.http_pool")  # one connection pool shared by every agent
+pricing = lazy_import("services.pricing")  # numpy
+telemetry = lazy_import("services.telemetry")  # numpy
+
+ASG_RUNNING = intern_value("running")
+ASG_STOPPED = intern_value("stopped")
+
+# Top-level fields read from each element of the Duplo list APIs; the rest is skipped while parsing
+RESOURCE_FIELDS = {
+    "rds": ("Identifier", "InstanceStatus", "Engine", "AllocatedStorage", "SizeEx"),
+    "ec2": ("FriendlyName", "Status", "InstanceId", "AgentPlatform", "Capacity"),
+    "asg": ("FriendlyName", "MaxSize", "MinSize", "Capacity", "DesiredCapacity"),
+}
+
+# Concurrent identical inventory fetches (same host, tenant and type) share one HTTP call
+inventory_fetches = SingleFlight()
+
+# Concurrent retries of one stop/start share one execution (recorded in action_store once it completes)
+action_flights = SingleFlight()
+
+# Run stop/start as background jobs (polled via /api/jobs/{id}) instead of inside the chat request
+ASYNC_ACTIONS = os.getenv("ASYNC_ACTIONS", "false").lower() in ("1", "true", "yes")
+
+# Convergence outcomes of stops/starts finished this many seconds ago or less are reported with state listings
+CONVERGENCE_REPORT_SECONDS = float(os.getenv("CONVERGENCE_REPORT_SECONDS", "1800"))
+
+# Payloads smaller than this (by Content-Length) are decoded at once, larger or chunked ones are streamed
+STREAM_PARSE_THRESHOLD = int(os.getenv("STREAM_PARSE_THRESHOLD", str(1024 * 1024)))
+
+# Actions the router can select, and the operation token each one maps to
+ROUTE_ACTIONS = {
+    "tenant_details": "t0",
+    "list_running": "t1",
+    "list_stopped": "t2",
+    "stop": "t3",
+    "start": "t4",
+    "changes": "t5",
+    "idle": "t6",
+    "other": "fallback",
+}
+
+# Structured output of the routing call, forced with tool_choice
+ROUTE_TOOL = {
+    "name": "route_request",
+    "description": "Select the cost optimisation operation that answers the user's latest request",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "action": {
+                "type": "string",
+                "enum": list(ROUTE_ACTIONS),
+                "description": "The operation to perform",
+            },
+            "target": {
+                "type": "string",
+                "description": (
+                    "For stop and start only: a resource type (ec2, rds, asg), a resource name, an instance id, "
+                    "a name pattern with *, or top:N for the N most expensive resources. Omit for all resources."
+                ),
+            },
+            "reply": {
+                "type": "string",
+                "description": "For tenant_details only: the complete answer to the user's question.",
+            },
+        },
+        "required": ["action"],
+    },
+}
+
+# "routed" (classify the request, then answer) or "tools" (the model calls the tools below itself)
+AGENT_MODE = os.getenv("COST_AGENT_MODE", "routed").lower()
+MAX_TOOL_ROUNDS = int(os.getenv("COST_AGENT_MAX_TOOL_ROUNDS", "4"))
+
+_TARGET_DESCRIPTION = (
+    "A resource type (ec2, rds, asg), a resource name, an instance id, a name pattern with *, "
+    "or top:N for the N most expensive resources. Omit for all resources."
+)
+INVENTORY_TOOLS = [
+    {
+        "name": "get_inventory",
+        "description": "List the running or stopped resources of the tenant with their estimated hourly cost",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "state": {"type": "string", "enum": ["running", "stopped"]},
+                "resource_type": {"type": "string", "enum": ["ec2", "rds", "asg"],
+                                  "description": "Only list this resource type. Omit for all types."},
+            },
+            "required": ["state"],
+        },
+    },
+    {
+        "name": "stop_resources",
+        "description": "Stop running resources of the tenant",
+        "input_schema": {
+            "type": "object",
+            "properties": {"target": {"type": "string", "description": _TARGET_DESCRIPTION}},
+        },
+    },
+    {
+        "name": "start_resources",
+        "description": "Start stopped resources of the tenant",
+        "input_schema": {
+            "type": "object",
+            "properties": {"target": {"type": "string", "description": _TARGET_DESCRIPTION}},
+        },
+    },
+]
+
+# Tool calls emitted in one model turn run concurrently on this pool
+tool_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("COST_AGENT_TOOL_WORKERS", "8")), thread_name_prefix="agent-tools"
+)
+
+# Fetch the tenant's inventory while the routing call is in flight (discarded when the route does not need it)
+INVENTORY_PREFETCH = os.getenv("INVENTORY_PREFETCH", "true").lower() in ("1", "true", "yes")
+prefetch_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("INVENTORY_PREFETCH_WORKERS", "8")), thread_name_prefix="inventory-prefetch"
+)
+# Operations that read the tenant's inventory
+INVENTORY_TOKENS = {"t1", "t2", "t3", "t4", "t6"}
+
 class Resource(AgentProtocol):
     """
     Base class for managing resources.
@@ -32,11 +172,15 @@ class Resource(AgentProtocol):
            # "ecache": ["available"],  # ElastiCache clusters
             "asg": ["running", "stopped"]  # Auto Scaling Groups
         }
-        requests.packages.urllib3.disable_warnings(category=InsecureRequestWarning)
+        requests.packages.urllib3.disable_warnings(category=requests.packages.urllib3.exceptions.InsecureRequestWarning)
 
-    def _get_resource(self, resource_type: str) -> List[Dict[str, Any]]:
+    def _get_resource(self, resource_type: str, raise_errors: bool = False) -> List[Dict[str, Any]]:
         """
         Helper method to fetch resources of a given type for a tenant.
+
+        Errors are logged and an empty list returned unless raise_errors is set
+        (the inventory syncer needs to tell a failed fetch from an empty tenant).
+        Concurrent calls for the same host, tenant and type are coalesced into one request.
         """
         logger.info(f"HOST_TOKEN {self.host_token}")
         if resource_type not in self.active_states:
@@ -54,81 +198,110 @@ class Resource(AgentProtocol):
             "Content-Type": "application/json",
             "Accept": "application/json"
         }
+        def request() -> "requests.Response":
+            response = http_pool.session().get(url, headers=headers, timeout=10, verify=False, stream=True)
+            try:
+                response.raise_for_status()
+            except Exception:
+                response.close()
+                raise
+            return response
+
+        def parse(response: "requests.Response") -> List[Dict[str, Any]]:
+            with response:
+                return self._parse_resource_payload(response, RESOURCE_FIELDS[resource_type])
+
         try:
-            response = requests.get(url, headers=headers, timeout=10, verify=False)
-            response.raise_for_status()
-            return response.json()
+            # A degraded host fails fast through its open circuit instead of waiting out the timeout;
+            # the breaker times the request up to the response headers, not the streamed parse
+            return inventory_fetches.do(
+                (self.host_url, self.tenant_id, resource_type),
+                lambda: circuit_breakers.call(self.host_url, f"{resource_type}:list", request, parse),
+            )
         except Exception as e:
             logger.error(f"Error fetching {resource_type} for tenant {self.tenant_id}: {e}")
+            if raise_errors:
+                raise
             return []
 
-    def get_rds_state(self) -> List[Dict[str, str]]:
+    def _parse_resource_payload(self, response: "requests.Response", fields: tuple) -> List[Dict[str, Any]]:
+        """
+        Parse a Duplo list response, keeping only the given fields of each element.
+
+        Large or chunked payloads are parsed incrementally from the response stream so
+        the full document (every field of every host) is never materialized.
+        """
+        length = response.headers.get("Content-Length")
+        if length is not None and int(length) < STREAM_PARSE_THRESHOLD:
+            payload = jsonlib.loads(response.content)
+            return list(jsonlib.project(payload, fields)) if isinstance(payload, list) else []
+
+        # Let urllib3 undo gzip/deflate transfer encoding while streaming
+        response.raw.decode_content = True
+        return list(jsonlib.iter_projected_items(response.raw, fields))
+
+    def get_rds_state(self, raise_errors: bool = False) -> List[RdsRecord]:
         """
-        Returns a list of dicts with RDS instance name and state.
+        Returns a list of RDS instance records (name, state, engine, size, instance class).
         """
-        rds_list = self._get_resource("rds")
-        return [{
-            "name": rds.get("Identifier"),
-            "state": rds.get("InstanceStatus"),
-            "engine": rds.get("Engine"),
-            "size": rds.get("AllocatedStorage")
-        } for rds in rds_list]
+        rds_list = self._get_resource("rds", raise_errors=raise_errors)
+        return [RdsRecord(
+            name=rds.get("Identifier"),
+            state=intern_value(rds.get("InstanceStatus")),
+            engine=intern_value(rds.get("Engine")),
+            size=rds.get("AllocatedStorage"),
+            instance_class=intern_value(rds.get("SizeEx")),
+        ) for rds in rds_list]
 
-    def get_ec2_state(self) -> List[Dict[str, str]]:
+    def get_ec2_state(self, raise_errors: bool = False) -> List[Ec2Record]:
         """
-        Returns a list of dicts with EC2 instance name and state.
+        Returns a list of EC2 instance records (name, state, instance_id, instance type).
         """
-        ec2_list = self._get_resource("ec2")
-        return [{
-            "name": ec2.get("FriendlyName"),
-            "state": ec2.get("Status"),
-            "instance_id": ec2.get("InstanceId")
-        } for ec2 in ec2_list if ec2.get("AgentPlatform") != 7]
+        ec2_list = self._get_resource("ec2", raise_errors=raise_errors)
+        return [Ec2Record(
+            name=ec2.get("FriendlyName"),
+            state=intern_value(ec2.get("Status")),
+            instance_id=ec2.get("InstanceId"),
+            instance_type=intern_value(ec2.get("Capacity")),
+        ) for ec2 in ec2_list if ec2.get("AgentPlatform") != 7]
 
-    def get_asg_state(self) -> List[Dict[str, str]]:
+    def get_asg_state(self, raise_errors: bool = False) -> List[AsgRecord]:
         """
-        Returns a list of dicts with EC2 instance name and state.
+        Returns a list of ASG records (name, state derived from the min/max size, instance type, capacity).
         """
-        asg_list = self._get_resource("asg")
-        return [{
-            "name": asg.get("FriendlyName"),
-            "state": "running" if asg.get("MaxSize", 0) > 0 and asg.get("MinSize", 0) > 0 else "stopped",
-        } for asg in asg_list]
+        asg_list = self._get_resource("asg", raise_errors=raise_errors)
+        return [AsgRecord(
+            name=asg.get("FriendlyName"),
+            state=ASG_RUNNING if asg.get("MaxSize", 0) > 0 and asg.get("MinSize", 0) > 0 else ASG_STOPPED,
+            instance_type=intern_value(asg.get("Capacity")),
+            desired_capacity=asg.get("DesiredCapacity"),
+        ) for asg in asg_list]
 
 
-    def get_resource_state(self, resource_type: str,inactive_state: bool) -> List[Dict[str, Any]]:
+    def get_resource_state(self, resource_type: str,inactive_state: bool) -> List[ResourceRecord]:
         """
         Get state of resources for a specific resource type.
+
+        All resources are returned regardless of inactive_state; use select_resources
+        to filter by state.
         """
         if resource_type not in self.active_states:
             raise ValueError(f"Unsupported resource type: {resource_type}")
         
-        # Get all resources of this type
-        all_resources = getattr(self, f"get_{resource_type}_state")()
-        
-        # Filter for active/running resources
-        entity = []
-        possibleState=self.active_states.get(resource_type, [])
-        for resource in all_resources:
-           # state = resource.get("state", "").lower()
-           # obj=f"{resource.get('name')} : {state}"
-            entity.append(resource)
-            #if inactive_state:
-            #    
-            #    if state == possibleState[1]:
-            #        obj=f"{resource.get('name')} : {state}"
-            #        entity.append(obj)
-            #else:
-            #    if state == possibleState[0]:
-            #        obj=f"{resource.get('name')} : {state}"
-            #        entity.append(obj)
-        
-        return entity
+        # Get all resources of this type (the records are returned as-is, not copied)
+        return getattr(self, f"get_{resource_type}_state")()
 
-    def get_running_resources(self, inactive_state: bool) -> Dict[str, List[Dict[str, Any]]]:
+    def get_running_resources(self, inactive_state: bool) -> Dict[str, List[ResourceRecord]]:
         """
         Get all running resources across all supported types.
+
+        When inventory sync is enabled the tenant's synced snapshot is returned
+        instead of fetching every type again.
         """
+        syncer = self.get_inventory_syncer()
+        if syncer:
+            return syncer.snapshot()
+
         running_states = {}
         for resource_type in self.active_states:
             try:
@@ -137,28 +310,136 @@ class Resource(AgentProtocol):
                 logger.error(f"Error getting state for {resource_type}: {e}")
                 running_states[resource_type] = []
         return running_states
+
+    def get_inventory_syncer(self):
+        """
+        Return the background inventory syncer for this tenant, or None when sync is disabled.
+        """
+        if not inventory_sync_manager.enabled or not self.tenant_id:
+            return None
+        host_url, tenant_name, tenant_id = self.host_url, self.tenant_name, self.tenant_id
+        return inventory_sync_manager.get_or_create(
+            host_url,
+            tenant_id,
+            lambda: Resource(host_url=host_url, tenant_name=tenant_name, tenant_id=tenant_id),
+            list(self.active_states),
+        )
+
+    def _watch_convergence(self, resources: Dict[str, List[ResourceRecord]], inactive_state: bool) -> None:
+        """
+        Track the resources a stop (or, with inactive_state, a start) was issued for until they
+        reach the target state; completion wakes the tenant's inventory syncer.
+        """
+        if not CONVERGENCE_WATCH:
+            return
+        # A start targets the active state, a stop the inactive one
+        desired_index = 0 if inactive_state else 1
+        targets = {
+            resource_type: {record.key: self.active_states[resource_type][desired_index] for record in records}
+            for resource_type, records in resources.items()
+            if records
+        }
+        host_url, tenant_name, tenant_id = self.host_url, self.tenant_name, self.tenant_id
+        convergence_tracker.watch(
+            host_url,
+            tenant_id,
+            lambda: Resource(host_url=host_url, tenant_name=tenant_name, tenant_id=tenant_id),
+            targets,
+        )
+
+    def format_convergence_status(self) -> str:
+        """
+        State changes of the tenant's recent stops/starts, as followed by the convergence tracker,
+        and how many resources are still on their way (empty when there is nothing to report).
+        """
+        if not CONVERGENCE_WATCH:
+            return ""
+        since = time.time() - CONVERGENCE_REPORT_SECONDS
+        lines = []
+        for event in convergence_tracker.recent_events(self.host_url, self.tenant_id, since=since):
+            if event.outcome == CONVERGED:
+                detail = f"{event.state} after {event.elapsed:.0f}s"
+            elif event.outcome == REMOVED:
+                detail = "no longer exists"
+            else:
+                detail = (f"not {event.desired_state} after {event.elapsed:.0f}s "
+                          f"(last seen {event.state or 'unknown'})")
+            lines.append(f"  - {event.resource_type.upper()} {event.key}: {detail}")
+        pending = convergence_tracker.pending(self.host_url, self.tenant_id)
+        if pending:
+            lines.append(f"  - {pending} resource(s) still changing state")
+        if not lines:
+            return ""
+        return "\n\nRecent state changes:\n" + "\n".join(lines)
+
+    def _request_inventory_sync(self) -> None:
+        """
+        Ask the tenant's syncer (if running) to pick up the state changes of a stop/start now.
+        """
+        syncer = inventory_sync_manager.get(self.host_url, self.tenant_id)
+        if syncer:
+            syncer.request_sync()
     
-    def stop_resources(self, resource_type: Optional[str] = None, resource_name: Optional[str] = None) -> None:
+    def get_resource_store(self, inventory: Optional[Dict[str, List[ResourceRecord]]] = None) -> ResourceStore:
+        """
+        Indexed view of the tenant's resources (shared with the inventory syncer when enabled).
+
+        inventory, if given, is an already fetched get_running_resources result to index.
+        """
+        syncer = self.get_inventory_syncer()
+        if syncer:
+            return syncer.store()
+        if inventory is None:
+            inventory = self.get_running_resources(inactive_state=False)
+        return ResourceStore(inventory)
+
+    def select_resources(self, resource_type: Optional[str] = None, resource_name: Optional[str] = None,
+                         inactive_state: bool = False,
+                         inventory: Optional[Dict[str, List[ResourceRecord]]] = None) -> Dict[str, List[ResourceRecord]]:
+        """
+        Resources that are running (or stopped, with inactive_state) grouped by type.
+
+        resource_name may be a name, an EC2 instance id or a glob pattern such as "dev-*".
+        """
+        if resource_type and resource_type not in self.active_states:
+            raise ValueError(f"Unsupported resource type: {resource_type}")
+        states = {t: possible[1 if inactive_state else 0] for t, possible in self.active_states.items()}
+        return self.get_resource_store(inventory).select(resource_type=resource_type, states=states, name=resource_name)
+
+    def stop_resources(self, resource_type: Optional[str] = None, resource_name: Optional[str] = None,
+                       progress: Optional[Callable[[int, int], None]] = None,
+                       limit: Optional[int] = None, failures: Optional[List[str]] = None,
+                       inventory: Optional[Dict[str, List[ResourceRecord]]] = None) -> Dict[str, List[ResourceRecord]]:
         """
         Stop all running resources across all supported types or a specific resource type.
 
         If resource_type is not specified, all running resources across all supported types will be stopped.
         If resource_type is specified, only the resources of that type that are currently running will be stopped.
-        If resource_name is specified, only the resource with that name will be stopped.
+        If resource_name is specified, only the matching resources (name, instance id or pattern) will be stopped.
+
+        Resources are stopped in order of estimated hourly savings; with limit only the
+        limit resources saving the most are stopped.
+
+        progress, if given, is called with (completed, total) as the stop requests are issued.
+        failures, if given, collects the resources whose stop request failed (or was refused by an open circuit).
+        inventory, if given, is the already fetched inventory to select from (see get_resource_store).
+
+        Returns the resources a stop was issued for, grouped by type.
         """
         logger.info(f"HOST_TOKEN {self.host_token}")
 
-        data = None
-        resources = self.get_running_resources(inactive_state=False)
-        if resource_type:
-            resources = resources.get(resource_type, [])
-        if resource_name:
-            resources = [r for r in resources if r.get("name") == resource_name]
+        resources = self.select_resources(resource_type, resource_name, inactive_state=False, inventory=inventory)
+        resources = pricing.default_catalog.rank_by_savings(resources, limit=limit)
+        total = sum(len(resource_details) for resource_details in resources.values())
+        completed = 0
+        if progress:
+            progress(completed, total)
         for resource_type,resource_details in resources.items():
            for resource in resource_details:
-                name = resource.get("name")
+                data = None
+                name = resource.name
                 if resource_type == "ec2":
-                    name=resource.get("instance_id")
+                    name=resource.instance_id
                 if resource_type == "asg":
                     data = json.dumps({
                         "FriendlyName": name,
@@ -171,11 +452,21 @@ class Resource(AgentProtocol):
                     "Content-Type": "application/json",
                     "Accept": "application/json"
                 }
-                try:
-                    response = requests.post(endpoint, headers=headers, timeout=10, verify=False,data=data)
+                def post() -> None:
+                    response = http_pool.session().post(endpoint, headers=headers, timeout=10, verify=False,data=data)
                     response.raise_for_status()
+                try:
+                    circuit_breakers.call(self.host_url, f"{resource_type}:stop", post)
                 except Exception as e:
                     logger.error(f"Error stopping resource {name}: {e}")
+                    if failures is not None:
+                        failures.append(f"{name} ({e})")
+                completed += 1
+                if progress:
+                    progress(completed, total)
+        self._request_inventory_sync()
+        self._watch_convergence(resources, inactive_state=False)
+        return resources
 
     def get_stop_endpoint_resource(self, resource_type: str, name: str) -> str:
         """
@@ -190,26 +481,35 @@ class Resource(AgentProtocol):
         }
         return endpoints.get(resource_type, "")
 
-    def start_resources(self, resource_type: Optional[str] = None, resource_name: Optional[str] = None) -> None:
+    def start_resources(self, resource_type: Optional[str] = None, resource_name: Optional[str] = None,
+                        progress: Optional[Callable[[int, int], None]] = None,
+                        failures: Optional[List[str]] = None,
+                        inventory: Optional[Dict[str, List[ResourceRecord]]] = None) -> Dict[str, List[ResourceRecord]]:
         """
-        Stop all running resources across all supported types or a specific resource type.
+        Start all stopped resources across all supported types or a specific resource type.
 
-        If resource_type is not specified, all running resources across all supported types will be stopped.
-        If resource_type is specified, only the resources of that type that are currently running will be stopped.
-        If resource_name is specified, only the resource with that name will be stopped.
+        If resource_type is not specified, all stopped resources across all supported types will be started.
+        If resource_type is specified, only the resources of that type that are currently stopped will be started.
+        If resource_name is specified, only the matching resources (name, instance id or pattern) will be started.
+
+        progress, if given, is called with (completed, total) as the start requests are issued.
+        failures, if given, collects the resources whose start request failed (or was refused by an open circuit).
+        inventory, if given, is the already fetched inventory to select from (see get_resource_store).
+
+        Returns the resources a start was issued for, grouped by type.
         """
         logger.info(f"HOST_TOKEN {self.host_token}")
-        data = None
-        resources = self.get_running_resources(inactive_state=True)
-        if resource_type:
-            resources = resources.get(resource_type, [])
-        if resource_name:
-            resources = [r for r in resources if r.get("name") == resource_name]
+        resources = self.select_resources(resource_type, resource_name, inactive_state=True, inventory=inventory)
+        total = sum(len(resource_details) for resource_details in resources.values())
+        completed = 0
+        if progress:
+            progress(completed, total)
         for resource_type,resource_details in resources.items():
            for resource in resource_details:
-                name = resource.get("name")
+                data = None
+                name = resource.name
                 if resource_type == "ec2":
-                    name=resource.get("instance_id")
+                    name=resource.instance_id
                 if resource_type == "asg":
                     data = json.dumps({
                         "FriendlyName": name,
@@ -222,11 +522,21 @@ class Resource(AgentProtocol):
                     "Content-Type": "application/json",
                     "Accept": "application/json"
                 }
-                try:
-                    response = requests.post(endpoint, headers=headers, timeout=10, verify=False,data=data)
+                def post() -> None:
+                    response = http_pool.session().post(endpoint, headers=headers, timeout=10, verify=False,data=data)
                     response.raise_for_status()
+                try:
+                    circuit_breakers.call(self.host_url, f"{resource_type}:start", post)
                 except Exception as e:
-                    logger.error(f"Error stopping resource {name}: {e}")
+                    logger.error(f"Error starting resource {name}: {e}")
+                    if failures is not None:
+                        failures.append(f"{name} ({e})")
+                completed += 1
+                if progress:
+                    progress(completed, total)
+        self._request_inventory_sync()
+        self._watch_convergence(resources, inactive_state=True)
+        return resources
 
     def get_start_endpoint_resource(self, resource_type: str, name: str) -> str:
         """
@@ -241,26 +551,125 @@ class Resource(AgentProtocol):
         }
         return endpoints.get(resource_type, "")
 
-    def format_resource_state(self, resources: Dict[str, List[Dict[str, Any]]],custom_state: str) -> str:
+    def format_resource_state(self, resources: Dict[str, List[ResourceRecord]],custom_state: str) -> str:
         """
         Format resource state information in a user-friendly way.
+
+        Resources are listed most expensive first with their estimated hourly cost
+        (the hourly savings when stopping), followed by the total. Listings (no custom_state)
+        only count the resources that are running into the total.
         """
         formatted_output = []
-        
+        stopping = custom_state.lower() == "stopping"
+        catalog = pricing.default_catalog
+        costs = catalog.savings(resources) if stopping else catalog.estimate(resources)
+        total = 0.0
+
         for resource_type, instances in resources.items():
             if instances:
                 formatted_output.append(f"\n{resource_type.upper()}")
-                for instance in instances:
-                    name = instance.get("name", "")
-                    state = instance.get("state", "")
+                type_costs = costs[resource_type]
+                for position in pricing.descending(type_costs).tolist():
+                    instance = instances[position]
+                    cost = type_costs[position]
+                    name = instance.name or ""
+                    state = instance.state or ""
+                    price = ""
+                    if cost == cost:  # not NaN
+                        if custom_state or instance.state == self.active_states[resource_type][0]:
+                            total += cost
+                        price = f" (~${cost:.4f}/h)"
                     if custom_state.lower() != "":
-                        formatted_output.append(f"  - {name}: {custom_state.lower()}")                    
+                        formatted_output.append(f"  - {name}: {custom_state.lower()}{price}")
                     else:
-                        formatted_output.append(f"  - {name}: {state}")
+                        formatted_output.append(f"  - {name}: {state}{price}")
 
-        
+        if formatted_output and total:
+            label = "Estimated hourly savings" if stopping else "Estimated hourly cost while running"
+            formatted_output.append(f"\n{label}: ~${total:.2f}/h ({catalog.currency})")
         return "\n".join(formatted_output)
 
+def _sync_on_convergence(event: ConvergenceEvent) -> None:
+    # A resource settled: refresh the tenant's synced inventory now instead of at the next interval
+    syncer = inventory_sync_manager.get(event.host_url, event.tenant_id)
+    if syncer:
+        syncer.request_sync()
+
+
+convergence_tracker.bus.subscribe(_sync_on_convergence)
+
+
+def run_scheduled_action(rule: ScheduleRule) -> Dict[str, List[ResourceRecord]]:
+    """
+    Execute one scheduled stop/start rule against its tenant.
+
+    Raises:
+        RuntimeError: If the inventory could not be fetched or any stop/start request failed,
+            so the run is recorded as failed
+    """
+    resource = Resource(host_url=rule.host_url, tenant_name=rule.tenant_name, tenant_id=rule.tenant_id)
+    inventory = None
+    if resource.get_inventory_syncer() is None:
+        # A failed fetch would otherwise look like a tenant with nothing to act on
+        inventory = {}
+        for resource_type in ([rule.resource_type] if rule.resource_type else resource.active_states):
+            try:
+                inventory[resource_type] = getattr(resource, f"get_{resource_type}_state")(raise_errors=True)
+            except Exception as e:
+                raise RuntimeError(f"Could not fetch {resource_type} resources: {e}") from e
+    failures: List[str] = []
+    if rule.action == "stop":
+        acted_on = resource.stop_resources(resource_type=rule.resource_type, resource_name=rule.name_pattern,
+                                           failures=failures, inventory=inventory)
+    else:
+        acted_on = resource.start_resources(resource_type=rule.resource_type, resource_name=rule.name_pattern,
+                                            failures=failures, inventory=inventory)
+    if failures:
+        raise RuntimeError(f"Could not {rule.action}: {', '.join(failures)}")
+    return acted_on
+
+
+def fetch_tenant_inventory(host_url: str, tenant_id: str, tenant_name: str) -> Dict[str, Any]:
+    """
+    Inventory of one tenant for the batch endpoint: records, state counts and the
+    estimated hourly cost of what is running. Per-type failures are reported in "errors"
+    and mark the tenant as partial.
+    """
+    syncer = inventory_sync_manager.get(host_url, tenant_id)
+    resource = Resource(host_url=host_url, tenant_name=tenant_name, tenant_id=tenant_id)
+    errors = {}
+    if syncer and syncer.ready:
+        inventory = syncer.snapshot()
+    else:
+        inventory = {}
+        for resource_type in resource.active_states:
+            try:
+                inventory[resource_type] = getattr(resource, f"get_{resource_type}_state")(raise_errors=True)
+            except Exception as e:
+                inventory[resource_type] = []
+                errors[resource_type] = str(e)
+
+    summary = {}
+    running_cost = 0.0
+    for resource_type, costs in pricing.default_catalog.estimate(inventory).items():
+        counts = {}
+        running_state = resource.active_states[resource_type][0]
+        for record, cost in zip(inventory[resource_type], costs.tolist()):
+            counts[record.state] = counts.get(record.state, 0) + 1
+            if record.state == running_state and cost == cost:  # not NaN
+                running_cost += cost
+        summary[resource_type] = counts
+    result = {
+        "resources": inventory,
+        "summary": summary,
+        "running_hourly_cost": round(running_cost, 4),
+        "errors": errors,
+    }
+    if errors:
+        result["status"] = "partial"
+    return result
+
+
 class CostOptimiserAgent(Resource):
     """
     An agent that creates RDS resource.
@@ -272,192 +681,612 @@ class CostOptimiserAgent(Resource):
         """
         self.llm = llm
         self.model_id = os.getenv("BEDROCK_MODEL_ID", "us.anthropic.claude-sonnet-4-20250514-v1:0")
-        self.token="t0"
-    def call_llm_for_token(self, messages: list) -> str:
+        self.scheduler=None
+        self.telemetry_poller=None
+
+    def start_background(self) -> None:
+        """
+        Start the off-hours scheduler when SCHEDULE_RULES_PATH is configured and ingest
+        the telemetry configured with TELEMETRY_PATH / TELEMETRY_ENDPOINT.
         """
-        Given a list of message dicts (chat format), return a semantic operation token like t0, t1, ..., t4.
-        The LLM is guided with a system prompt that explains the task clearly.
+        self.scheduler = scheduler_from_env(run_scheduled_action)
+        if self.scheduler:
+            self.scheduler.start()
+        # Checked here so the telemetry module (and numpy) is only loaded when configured
+        if os.getenv("TELEMETRY_PATH") or os.getenv("TELEMETRY_ENDPOINT"):
+            self.telemetry_poller = telemetry.load_from_env(telemetry.default_store)
+            if self.telemetry_poller:
+                self.telemetry_poller.start()
+
+    def stop_background(self) -> None:
+        if self.scheduler:
+            self.scheduler.stop()
+        if self.telemetry_poller:
+            self.telemetry_poller.stop()
+        inventory_sync_manager.stop_all()
+
+    def stream_inventory(self, tenants: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Fetch the inventories of many tenants concurrently, yielding each tenant as it completes.
+
+        Args:
+            tenants: Dicts with duplo_base_url, tenant_id and optionally tenant_name
         """
-        system_prompt = """
-You are an intelligent command router. Based on the user's request, return the correct operation token from the list below.
-Respond only with the token ID. Do not explain or add anything else.
+        refs = [(t["duplo_base_url"], t["tenant_id"], t.get("tenant_name") or "") for t in tenants]
+        for result in batch_fetcher.run(refs, fetch_tenant_inventory):
+            yield result.to_dict()
 
-Token mappings:
-- tenant details → t0
-- get running resource → t1
-- get stopped resource → t2
-- stop running resources → t3
-- start stopped resources → t4
+    def route_request(self, messages: list) -> tuple:
+        """
+        Select the operation for the latest user message with one structured (tool) call.
+
+        Returns:
+            (token, target, reply): the operation token (t0..t6, or "fallback"), the stop/start
+            target if any, and the complete answer when the router could give it directly
+        """
+        system_prompt = f"""
+You are Duplo Dash, the request router of a cost optimisation assistant. Select the action for the user's
+latest request with the route_request tool.
 
-If the user asks anything semantically similar, choose the appropriate token.
+Actions:
+- tenant_details: questions about the tenant or platform (answer them in reply)
+- list_running: get running resources
+- list_stopped: get stopped resources
+- stop: stop running resources
+- start: start stopped resources
+- changes: what changed in resources since last time
+- idle: which resources are idle, or when they could be stopped
+- other: anything else
+
+If the user asks anything semantically similar, choose the appropriate action.
 Examples:
-- "show me tenant info" → t0
-- "list active resources" → t1
-- "bring up stopped instances" → t4
-- "pause all services" → t3
-- "retrieve halted machines" → t2
+- "show me tenant info" -> tenant_details
+- "list active resources" -> list_running
+- "bring up stopped instances" -> start
+- "pause all services" -> stop
+- "retrieve halted machines" -> list_stopped
+- "did anything change since we last spoke" -> changes
+- "suggest a shutdown schedule for idle servers" -> idle
+
+For stop and start, if the user names what to stop or start, set target:
+- "stop i-0abc123" -> stop, target i-0abc123
+- "start all dev-* hosts" -> start, target dev-*
+- "stop the databases" -> stop, target rds
+- "stop the 3 most expensive resources" -> stop, target top:3
 
-Now process the request and return the correct token.
+Tenant ID: {getattr(self, "tenant_id", "")}
+Tenant Name: {getattr(self, "tenant_name", "")}
+Platform URL: {getattr(self, "host_url", "")}
 """
 
-        response = self.llm.invoke(
+        route = self.llm.invoke(
             messages=messages,
             model_id=self.model_id,
-            system_prompt=system_prompt.strip()
+            system_prompt=system_prompt.strip(),
+            tools=[ROUTE_TOOL],
+            tool_choice={"type": "tool", "name": ROUTE_TOOL["name"]},
+        )
+
+        token = ROUTE_ACTIONS.get(str(route.get("action", "")).strip().lower(), "fallback")
+        target = str(route.get("target") or "").strip().lower() or None
+        reply = route.get("reply") or None
+        return (
+            token,
+            target if token in ("t3", "t4") else None,
+            reply if token == "t0" else None,
         )
 
-        # Assuming content has only the token
-        token = response.strip().lower()
-        # Optionally validate if it's one of the expected tokens
-        valid_tokens = {"t0", "t1", "t2", "t3", "t4"}
-        return token if token in valid_tokens else "fallback"
+    def resolve_target(self, target: Optional[str]) -> tuple:
+        """
+        Map a routed target to (resource_type, resource_name, limit) for stop_resources/start_resources.
+
+        "top:N" selects the N resources with the highest estimated hourly cost.
+        """
+        if not target or target in ("all", "*"):
+            return None, None, None
+        scope, _, count = target.partition(":")
+        if scope == "top" and count.strip().isdigit():
+            return None, None, int(count)
+        if target in self.active_states:
+            return target, None, None
+        return None, target, None
 
-    def call_bedrock_anthropic_llm(self, messages: list):
+    def call_bedrock_anthropic_llm(self, messages: list, token: str = "t0"):
         """
-        Call the LLM with the provided messages and context.
+        Call the LLM with the provided messages and the context of the routed operation token.
         """
         system_prompt="""
         You are Duplo Dash, a helpful assistant focused on reducing cost by managing resources by stopping the resources when not in use and starting the resources when in use. Here are the details for the current context:
         You should only introduce yourself if user greets you, dont specify any other information until specificaly asked.
         """
-        if any("t0" in msg.get("content","").lower() for msg in messages):
-
+        # The routed operation decides which context is added; the latest message carries its data
+        if token == "t0":
             system_prompt += self.tenantDetail_prompt()
-
-        if any("t1" in msg.get("content", "").lower() or "-0" in msg.get("content", "").lower() for msg in messages):
-
+        elif token == "t1":
             system_prompt += self.all_runningResources_prompt(messages)
-
-        elif any("t3" in msg.get("content", "").lower() or "-2" in msg.get("content", "").lower() for msg in messages):
-
+        elif token == "t2":
+            system_prompt += self.all_stoppedResources_prompt(messages)
+        elif token == "t3":
             system_prompt += self.stopAllResources_prompt(messages)
-
-        elif any("t4" in msg.get("content", "").lower() or "-3" in msg.get("content", "").lower() for msg in messages):
-
+        elif token == "t4":
             system_prompt += self.startAllResources_prompt(messages)
+        elif token == "t5":
+            system_prompt += self.inventoryChanges_prompt(messages)
+        elif token == "t6":
+            system_prompt += self.idleResources_prompt(messages)
 
-        elif any("t2" in msg.get("content", "").lower() or "-1" in msg.get("content", "").lower() for msg in messages):
-        
-            system_prompt += self.all_stoppedResources_prompt(messages)
-            
         return self.llm.invoke(messages=messages, model_id=self.model_id, system_prompt=system_prompt)
 
-    def preprocess_messages(self, messages: Dict[str, List[Dict[str, Any]]]):
+    def preprocess_messages(self, messages: Messages, token: str, target: Optional[str] = None,
+                            inventory: Optional[Dict[str, List[ResourceRecord]]] = None) -> tuple:
         """
         Preprocess messages to include tenant context.
-        """
-        preprocessed_messages = []
-        messages_list = messages.get("messages", [])
-        # Set host_url and tenant_id from platform context
-        for message in messages_list:
-            role = message.get("role", "")
-            platform_ctx = message.get("platform_context", {})
-            # Update instance variables with platform context
-            if platform_ctx:
 
-                host_url = platform_ctx.get("duplo_base_url", "")
-                tenant_id = platform_ctx.get("tenant_id", "")
-                tenant_name = platform_ctx.get("tenant_name", "")
-                super().__init__(host_url=host_url, tenant_name=tenant_name, tenant_id=tenant_id)          
-            
-            if role=="user":
+        Args:
+            messages: The request messages
+            token: The routed operation token, whose data replaces the latest user message
+            target: The routed stop/start target
+            inventory: The tenant's prefetched inventory, if any
 
-                if "t0"==self.token:
-                  logger.info("token t0 : tenant detail process selected")
-                  preprocessed_messages.append(self.tenant_details())
+        Returns:
+            (preprocessed_messages, job_id): the messages for the answering call and the job queued, if any
+        """
+        job_id = None
+        preprocessed_messages = []
+        messages_list = messages.messages
+        # Only the latest user message triggers the routed operation; earlier turns are kept as-is
+        latest_user_index = max((i for i, m in enumerate(messages_list) if m.role == "user"), default=-1)
+        for index, message in enumerate(messages_list):
+            role = message.role
+            if role=="user" and index == latest_user_index:
 
-                elif "t1"==self.token:
+                if "t1"==token:
                    logger.info("token t1 : get running resource process selected")
 
-                   preprocessed_messages.append(self.all_running_resources())
+                   preprocessed_messages.append(self.all_running_resources(inventory))
 
-                elif "t2"==self.token:
+                elif "t2"==token:
                     logger.info("token t2 : get stopped resource process selected")
-                    preprocessed_messages.append(self.all_stopped_resources())  
+                    preprocessed_messages.append(self.all_stopped_resources(inventory))  
 
-                elif "t4"==self.token:
+                elif "t4"==token:
                     logger.info("token t4 : stop started resources process selected")
-                    preprocessed_messages.append(self.start_all_stopped_resources())
+                    message, job_id = self.start_all_stopped_resources(target, inventory)
+                    preprocessed_messages.append(message)
 
-                elif "t3"==self.token:
+                elif "t3"==token:
                     logger.info("token t3 : stop running resources process selected")
-                    preprocessed_messages.append(self.stop_all_running_resources())
+                    message, job_id = self.stop_all_running_resources(target, inventory)
+                    preprocessed_messages.append(message)
+
+                elif "t5"==token:
+                    logger.info("token t5 : inventory changes process selected")
+                    preprocessed_messages.append(self.inventory_changes(self._last_reply_time(messages_list)))
+
+                elif "t6"==token:
+                    logger.info("token t6 : idle resources process selected")
+                    preprocessed_messages.append(self.idle_resources(inventory))
     
                 else:
                     preprocessed_messages.append({
                         "role": role,
-                        "content": message.get("content", "")
+                        "content": message.content
                     })
             else:
                 preprocessed_messages.append({
                 "role": role,
-                "content": message.get("content", "")
+                "content": message.content
             })
             
-        return preprocessed_messages
+        return preprocessed_messages, job_id
        
 
     def invoke(self, messages: Dict[str, List[Dict[str, Any]]]) -> AgentMessage:
         """
         Process user messages and use an LLM to generate responses.
         """
+        return self.invoke_typed(Messages.model_validate(messages))
 
+    def invoke_typed(self, messages: Messages) -> AgentMessage:
+        """
+        Same as invoke, reading the validated models directly.
+
+        The agent instance serves every request, so each request binds its tenant on its own
+        shallow copy and keeps its routing results and prefetched inventory in locals.
+        """
+        agent = copy.copy(self)
+        agent.load_tenant_context(messages)
+        return agent.answer(messages)
+
+    def answer(self, messages: Messages) -> AgentMessage:
+        """
+        Answer the request with the agent bound to its tenant (see invoke).
+        """
+        if AGENT_MODE == "tools":
+            content, job_ids = self.invoke_with_tools(messages)
+            return AgentMessage(content=content, data=Data(job_id=job_ids[0] if job_ids else None, job_ids=job_ids))
+
+        prefetch = self.start_inventory_prefetch()
         token_messages=self.preprocess_message_for_token(messages)
-        self.token=self.call_llm_for_token(token_messages)
-        preprocessed_messages = self.preprocess_messages(messages)
-        
-        response = self.call_bedrock_anthropic_llm(preprocessed_messages)
-        return AgentMessage(content=response)
+        try:
+            token, target, reply = self.route_request(token_messages)
+            logger.info(f"Routed request to {token} (target: {target})")
+            # Tenant questions are answered by the routing call itself
+            if reply:
+                return AgentMessage(content=reply)
+            inventory = self.collect_inventory_prefetch(prefetch) if token in INVENTORY_TOKENS else None
+        finally:
+            self.discard_inventory_prefetch(prefetch)
 
-    
-    def tenant_details(self)->Dict[str,Any]:
-        content=f"t0"
-        return  {
-              "role": "user",
-              "content": content
-          }
+        preprocessed_messages, job_id = self.preprocess_messages(messages, token, target, inventory)
+        response = self.call_bedrock_anthropic_llm(preprocessed_messages, token)
+        return AgentMessage(content=response, data=Data(job_id=job_id, job_ids=[job_id] if job_id else []))
+
+    def start_inventory_prefetch(self) -> Optional[Dict[str, Future]]:
+        """
+        Start fetching every resource type of the tenant concurrently, ahead of routing.
+
+        Returns:
+            One future per resource type, for collect_inventory_prefetch; None when the tenant is
+            unknown or a synced snapshot is already available
+        """
+        if not INVENTORY_PREFETCH or not getattr(self, "tenant_id", None) or self.get_inventory_syncer():
+            return None
+        # The fetches run on their own Resource bound to this tenant
+        resource = Resource(host_url=self.host_url, tenant_name=self.tenant_name, tenant_id=self.tenant_id)
+        return {
+            resource_type: prefetch_pool.submit(resource.get_resource_state, resource_type, False)
+            for resource_type in self.active_states
+        }
+
+    @staticmethod
+    def discard_inventory_prefetch(prefetch: Optional[Dict[str, Future]]) -> None:
+        for future in (prefetch or {}).values():
+            future.cancel()
+
+    @staticmethod
+    def collect_inventory_prefetch(prefetch: Optional[Dict[str, Future]]) -> Optional[Dict[str, List[ResourceRecord]]]:
+        """
+        Wait for a prefetch and return it in the shape of get_running_resources (None without a prefetch).
+        """
+        if prefetch is None:
+            return None
+        running_states = {}
+        for resource_type, future in prefetch.items():
+            try:
+                running_states[resource_type] = future.result()
+            except Exception as e:
+                logger.error(f"Error getting state for {resource_type}: {e}")
+                running_states[resource_type] = []
+        return running_states
+
+    def invoke_with_tools(self, messages: Messages) -> tuple:
+        """
+        Answer with an agent loop: the model calls the inventory/stop/start tools it needs, every
+        tool call of one turn runs concurrently, and all results go back in a single message.
+
+        Returns:
+            (answer, job_ids): the model's final text answer and the jobs queued by its tool calls
+        """
+        system_prompt = f"""
+You are Duplo Dash, a helpful assistant focused on reducing cost by managing resources by stopping the resources when not in use and starting the resources when in use.
+You should only introduce yourself if user greets you, dont specify any other information until specificaly asked.
+Use the tools to look up, stop or start resources. When a request needs several independent operations, call all
+of their tools in the same turn. Stops and starts take some time to complete after the tool returns.
+
+Tenant ID: {self.tenant_id}
+Tenant Name: {self.tenant_name}
+Platform URL: {self.host_url}
+"""
+        conversation = [{"role": message.role, "content": message.content} for message in messages.messages]
+        job_ids = []
+        for round_index in range(MAX_TOOL_ROUNDS + 1):
+            response = self.llm.invoke_raw(
+                messages=conversation,
+                model_id=self.model_id,
+                max_tokens=2000,
+                system_prompt=system_prompt.strip(),
+                tools=INVENTORY_TOOLS,
+            )
+            blocks = response.get("content", [])
+            text = "\n".join(block.get("text", "") for block in blocks if block.get("type") == "text").strip()
+            tool_uses = [block for block in blocks if block.get("type") == "tool_use"]
+            if not tool_uses:
+                return text, job_ids
+            if round_index == MAX_TOOL_ROUNDS:
+                logger.warning(f"Tool loop stopped after {MAX_TOOL_ROUNDS} rounds")
+                return text or "I could not complete this request, please try a more specific one.", job_ids
+
+            logger.info(f"Running tools: {', '.join(tool_use['name'] for tool_use in tool_uses)}")
+            conversation.append({"role": "assistant", "content": blocks})
+            tool_results = self.run_tools(tool_uses)
+            conversation.append({"role": "user", "content": [result for result, _ in tool_results]})
+            job_ids.extend(job_id for _, job_id in tool_results if job_id)
+        return "", job_ids
+
+    def run_tools(self, tool_uses: List[Dict[str, Any]]) -> List[tuple]:
+        """
+        Execute the tool_use blocks of one model turn concurrently.
 
-    def all_running_resources(self)->Dict[str,Any]:
-        content=f"t1:\n\n"
-        running_resources = self.get_running_resources(inactive_state=False)
+        Returns:
+            One (tool_result block, job id) per tool_use, in the same order; failures are reported as errors
+        """
+        def execute(tool_use: Dict[str, Any]) -> tuple:
+            result = {"type": "tool_result", "tool_use_id": tool_use["id"]}
+            job_id = None
+            try:
+                result["content"], job_id = self.run_tool(tool_use["name"], tool_use.get("input") or {})
+            except Exception as e:
+                logger.error(f"Tool {tool_use['name']} failed: {e}")
+                result["content"] = f"Error: {e}"
+                result["is_error"] = True
+            return result, job_id
+
+        if len(tool_uses) == 1:
+            return [execute(tool_uses[0])]
+        return list(tool_pool.map(execute, tool_uses))
+
+    def run_tool(self, name: str, tool_input: Dict[str, Any]) -> tuple:
+        """
+        Execute one of INVENTORY_TOOLS and return its result as text, with the id of the job it queued (if any).
+        """
+        if name == "get_inventory":
+            state = str(tool_input.get("state") or "running").strip().lower()
+            if state not in ("running", "stopped"):
+                raise ValueError(f"Unsupported state: {state!r} (expected 'running' or 'stopped')")
+            inactive_state = state == "stopped"
+            resource_type = str(tool_input.get("resource_type") or "").strip().lower() or None
+            if resource_type and resource_type not in self.active_states:
+                raise ValueError(f"Unsupported resource type: {resource_type!r} "
+                                 f"(expected one of {', '.join(self.active_states)})")
+            resources = self.select_resources(resource_type, inactive_state=inactive_state)
+            formatted_resources = self.format_resource_state(resources, custom_state="")
+            formatted_resources = formatted_resources or f"No {'stopped' if inactive_state else 'running'} resources."
+            return formatted_resources + self.format_convergence_status(), None
+        # Targets are matched like the routed ones (resource types and names are lower case)
+        target = str(tool_input.get("target") or "").strip().lower() or None
+        if name == "stop_resources":
+            message, job_id = self.stop_all_running_resources(target)
+            return message["content"], job_id
+        if name == "start_resources":
+            message, job_id = self.start_all_stopped_resources(target)
+            return message["content"], job_id
+        raise ValueError(f"Unknown tool: {name}")
+
+    def load_tenant_context(self, messages: Messages) -> None:
+        """
+        Bind the agent to the tenant of the latest message carrying a platform context.
+        """
+        for message in reversed(messages.messages):
+            platform_ctx = message.platform_context
+            if platform_ctx:
+                super().__init__(
+                    host_url=platform_ctx.duplo_base_url or "",
+                    tenant_name=platform_ctx.tenant_name or "",
+                    tenant_id=platform_ctx.tenant_id or "",
+                )
+                return
+        super().__init__(host_url="", tenant_name="", tenant_id="")
+
+    def all_running_resources(self, inventory: Optional[Dict[str, List[ResourceRecord]]] = None)->Dict[str,Any]:
+        content=""
+        running_resources = inventory if inventory is not None else self.get_running_resources(inactive_state=False)
         formatted_resources = self.format_resource_state(running_resources,custom_state="")
-        content += f"\n\n{formatted_resources}"
+        content += formatted_resources + self.format_convergence_status()
         return  {
               "role": "user",
               "content": content
           }                
 
-    def all_stopped_resources(self)->Dict[str,Any]:
-        content=f"t2:\n\n"
-        stopped_resources = self.get_running_resources(inactive_state=True)
+    def all_stopped_resources(self, inventory: Optional[Dict[str, List[ResourceRecord]]] = None)->Dict[str,Any]:
+        content=""
+        stopped_resources = inventory if inventory is not None else self.get_running_resources(inactive_state=True)
         formatted_resources = self.format_resource_state(stopped_resources,custom_state="")
-        content += f"\n\n{formatted_resources}"
+        content += formatted_resources + self.format_convergence_status()
         return  {
               "role": "user",
               "content": content
           }                
 
-    def start_all_stopped_resources(self)->Dict[str,Any]:
-        content=f"t4"
-        stopped_resources = self.get_running_resources(inactive_state=True)
-        formatted_resources = self.format_resource_state(stopped_resources,custom_state="starting")
-        self.start_resources()
-        content += f"\n\n{formatted_resources}"
+    def start_all_stopped_resources(self, target: Optional[str] = None,
+                                    inventory: Optional[Dict[str, List[ResourceRecord]]] = None)->tuple:
+        # Starts are not limited by cost, only stops are
+        resource_type, resource_name, _ = self.resolve_target(target)
+        def start() -> tuple:
+            if ASYNC_ACTIONS:
+                return (*self.queue_action('start', resource_type, resource_name), True)
+            failures = []
+            started_resources = self.start_resources(resource_type=resource_type, resource_name=resource_name,
+                                                     failures=failures, inventory=inventory)
+            formatted_resources = self.format_resource_state(started_resources,custom_state="starting")
+            content = formatted_resources or 'No matching stopped resources.'
+            if failures:
+                content += "\n\nCould not start: " + ", ".join(failures)
+            return content, None, any(started_resources.values()) and not failures
+        content, job_id = self.deduplicated_action("start", resource_type, resource_name, None, start)
         return  {
               "role": "user",
               "content": content
-          }                                
+          }, job_id
     
-    def stop_all_running_resources(self)->Dict[str,Any]:
-        content=f"t3"
-        running_resources = self.get_running_resources(inactive_state=False)
-        formatted_resources = self.format_resource_state(running_resources,custom_state="stopping")
-        self.stop_resources()
-        content += f"\n\n{formatted_resources}"
+    def stop_all_running_resources(self, target: Optional[str] = None,
+                                   inventory: Optional[Dict[str, List[ResourceRecord]]] = None)->tuple:
+        resource_type, resource_name, limit = self.resolve_target(target)
+        def stop() -> tuple:
+            if ASYNC_ACTIONS:
+                return (*self.queue_action('stop', resource_type, resource_name, limit), True)
+            failures = []
+            stopped_resources = self.stop_resources(resource_type=resource_type, resource_name=resource_name,
+                                                    limit=limit, failures=failures, inventory=inventory)
+            formatted_resources = self.format_resource_state(stopped_resources,custom_state="stopping")
+            content = formatted_resources or 'No matching running resources.'
+            if failures:
+                content += "\n\nCould not stop: " + ", ".join(failures)
+            return content, None, any(stopped_resources.values()) and not failures
+        content, job_id = self.deduplicated_action("stop", resource_type, resource_name, limit, stop)
+        return  {
+              "role": "user",
+              "content": content
+          }, job_id
+
+    def deduplicated_action(self, action: str, resource_type: Optional[str], resource_name: Optional[str],
+                            limit: Optional[int], run: Callable[[], tuple]) -> tuple:
+        """
+        Run a stop/start unless it repeats the latest action recorded for the same target of this
+        tenant within ACTION_DEDUP_WINDOW, in which case the original result is returned (UI retries
+        would otherwise re-send every request).
+
+        Args:
+            run: Performs the action and returns (content, job id, completed); only completed actions
+                (every request issued and accepted, or a job queued) are recorded, so a failed one can be retried
+
+        Returns:
+            The content and the job id of the action (None unless it was queued)
+
+        The entry is kept per target, so a later start or stop of the same target replaces it.
+        """
+        key = "|".join([self.host_url, self.tenant_id, resource_type or "*", resource_name or "*"])
+        ran = []
+
+        def execute() -> tuple:
+            stored = action_store.get(key)
+            if stored is not None:
+                outcome, age = stored
+                job = job_queue.get(outcome["job_id"]) if outcome.get("job_id") else None
+                if (outcome["action"], outcome["limit"]) == (action, limit) and not (job and job.status == FAILED):
+                    return outcome, age
+            ran.append(True)
+            content, job_id, completed = run()
+            outcome = {"action": action, "limit": limit, "content": content, "job_id": job_id}
+            if completed:
+                action_store.put(key, outcome)
+            return outcome, None
+
+        if not action_store.enabled:
+            return run()[:2]
+        # Concurrent retries of the same action wait for the first one instead of running it again
+        outcome, age = action_flights.do((key, action, limit), execute)
+        if ran:
+            return outcome["content"], outcome["job_id"]
+        age = age or 0.0
+        logger.info(f"Duplicate {action} for tenant {self.tenant_id} ({age:.0f}s after the original), not issued again")
+        return (f"The same {action} request was already handled {age:.0f}s ago, so no new requests were sent. "
+                f"Its result was:\n{outcome['content']}", outcome.get("job_id"))
+                    
+    def queue_action(self, action: str, resource_type: Optional[str], resource_name: Optional[str],
+                     limit: Optional[int] = None) -> tuple:
+        """
+        Enqueue a stop/start as a background job and return (text describing it, job id).
+
+        The job gets its own Resource bound to the current tenant, so later requests
+        re-initialising this agent do not affect it.
+        """
+        resource = Resource(host_url=self.host_url, tenant_name=self.tenant_name, tenant_id=self.tenant_id)
+        def execute(job: Job) -> Dict[str, List[ResourceRecord]]:
+            failures = []
+            if action == "stop":
+                resources = resource.stop_resources(resource_type=resource_type, resource_name=resource_name,
+                                                    progress=job.update_progress, limit=limit, failures=failures)
+            else:
+                resources = resource.start_resources(resource_type=resource_type, resource_name=resource_name,
+                                                     progress=job.update_progress, failures=failures)
+            # A failed job is not treated as a duplicate of its retry
+            if failures:
+                raise RuntimeError(f"Could not {action}: {', '.join(failures)}")
+            return resources
+
+        job = job_queue.submit(action, self.tenant_id, execute)
+        scope = f"the {limit} most expensive" if limit else resource_name or resource_type or "all"
+        return (f"Job {job.job_id} was queued to {action} {scope} resources; its progress is available from the job id.",
+                job.job_id)
+
+    def inventory_changes(self, since: float = 0.0)->Dict[str,Any]:
+        content=""
+        syncer = self.get_inventory_syncer()
+        if syncer is None:
+            content += "Change tracking is not enabled for this agent."
+        else:
+            content += self.format_inventory_changes(syncer.changes_since(since))
+        return  {
+              "role": "user",
+              "content": content
+          }
+
+    def format_inventory_changes(self, changes: list) -> str:
+        """
+        Format inventory changes recorded by the syncer, grouped by resource type.
+        """
+        if not changes:
+            return "No resource changes detected."
+        formatted_output = []
+        current_type = None
+        for change in sorted(changes, key=lambda c: (c.resource_type, c.timestamp)):
+            if change.resource_type != current_type:
+                current_type = change.resource_type
+                formatted_output.append(f"\n{current_type.upper()}")
+            at = datetime.fromtimestamp(change.timestamp, tz=timezone.utc).strftime("%Y/%m/%d %H:%M UTC")
+            name = change.name or change.key
+            if change.change == "state_changed":
+                formatted_output.append(f"  - {name}: {change.old_state} -> {change.new_state} at {at}")
+            elif change.change == "added":
+                formatted_output.append(f"  - {name}: added ({change.new_state}) at {at}")
+            elif change.change == "removed":
+                formatted_output.append(f"  - {name}: removed at {at}")
+            else:
+                formatted_output.append(f"  - {name}: configuration updated at {at}")
+        return "\n".join(formatted_output)
+
+    def idle_resources(self, inventory: Optional[Dict[str, List[ResourceRecord]]] = None)->Dict[str,Any]:
+        content=""
+        resources = inventory if inventory is not None else self.get_running_resources(inactive_state=False)
+        keys = [f"{resource_type}:{record.key}" for resource_type, records in resources.items() for record in records]
+        content += self.format_idle_reports(telemetry.analyze_idle(telemetry.default_store, keys), resources)
         return  {
               "role": "user",
               "content": content
-          }                                
+          }
+
+    def format_idle_reports(self, reports: List["telemetry.IdleReport"], resources: Dict[str, List[ResourceRecord]]) -> str:
+        """
+        Format idle analysis results grouped by resource type, with the weekly savings of
+        following the recommended schedule.
+        """
+        if not reports:
+            return "No utilisation telemetry is available for the resources of this tenant."
+        names, savings = {}, {}
+        for resource_type, type_costs in pricing.default_catalog.savings(resources).items():
+            for record, cost in zip(resources[resource_type], type_costs.tolist()):
+                key = f"{resource_type}:{record.key}"
+                names[key] = record.name
+                savings[key] = cost
+        formatted_output = []
+        current_type = None
+        for report in sorted(reports, key=lambda r: (r.resource_type, -r.weekly_idle_hours)):
+            if report.resource_type != current_type:
+                current_type = report.resource_type
+                formatted_output.append(f"\n{current_type.upper()}")
+            name = names.get(report.key) or report.resource_key
+            line = f"  - {name}: idle {report.idle_fraction:.0%} of the time"
+            if report.always_idle:
+                line += "; idle all week, candidate for stopping"
+            elif report.stop_crons:
+                line += (f"; idle {report.weekly_idle_hours}h a week, stop at "
+                         f"{' and '.join(report.stop_crons)}, start at {' and '.join(report.start_crons)} (cron, UTC)")
+            cost = savings.get(report.key, float("nan"))
+            if report.weekly_idle_hours and cost == cost:  # not NaN
+                line += f" (~${cost * report.weekly_idle_hours:.2f}/week)"
+            formatted_output.append(line)
+        return "\n".join(formatted_output)
+
+    @staticmethod
+    def _last_reply_time(messages_list: list) -> float:
+        """
+        Epoch timestamp of the latest assistant reply in the conversation, 0 if unknown.
+        """
+        for message in reversed(messages_list):
+            if message.role == "assistant" and message.timestamp is not None:
+                return message.timestamp.timestamp()
+        return 0.0
                     
     def tenantDetail_prompt(self)->str:
         return f"""
@@ -475,9 +1304,7 @@ When answering questions about tenant or platform details, use the stored inform
 
     def all_runningResources_prompt(self,messages: list)->str:
         sentence=messages[-1].get("content", "") 
-        word_to_remove="t1"
-        new_sentence = sentence.replace(word_to_remove, "")
-        cleaned_sentence = ' '.join(new_sentence.split())
+        cleaned_sentence = ' '.join(sentence.split())
         content=cleaned_sentence
 
         return f"""
@@ -486,19 +1313,31 @@ When answering questions about running resources, use the stored information abo
 """
     def all_stoppedResources_prompt(self,messages: list)->str:
         sentence=messages[-1].get("content", "") 
-        word_to_remove="t2"
-        new_sentence = sentence.replace(word_to_remove, "")
-        cleaned_sentence = ' '.join(new_sentence.split())
+        cleaned_sentence = ' '.join(sentence.split())
         content=cleaned_sentence
         return f"""
 The stopped resource in tenant {self.tenant_name} is {content}.
 When answering questions about stopped resources, use the stored information above.
 """ 
+    def inventoryChanges_prompt(self,messages: list)->str:
+        sentence=messages[-1].get("content", "")
+        content=sentence.strip()
+        return f"""
+The resource changes in tenant {self.tenant_name} since the last reply are:
+{content}
+When answering questions about what changed, use the stored information above.
+"""
+    def idleResources_prompt(self,messages: list)->str:
+        sentence=messages[-1].get("content", "")
+        content=sentence.strip()
+        return f"""
+The utilisation analysis of the resources in tenant {self.tenant_name} over the last two weeks is:
+{content}
+Schedules are cron expressions in UTC. When answering questions about idle resources or when to stop them, use the stored information above.
+"""
     def stopAllResources_prompt(self,messages: list)->str:  
         sentence=messages[-1].get("content", "") 
-        word_to_remove="t3"
-        new_sentence = sentence.replace(word_to_remove, "")
-        cleaned_sentence = ' '.join(new_sentence.split())
+        cleaned_sentence = ' '.join(sentence.split())
         content=cleaned_sentence
         
         return f"""
@@ -508,9 +1347,7 @@ When answering questions about stopping all resources, use the stored informatio
     
     def startAllResources_prompt(self,messages: list)->str:  
         sentence=messages[-1].get("content", "") 
-        word_to_remove="t4"
-        new_sentence = sentence.replace(word_to_remove, "")
-        cleaned_sentence = ' '.join(new_sentence.split())
+        cleaned_sentence = ' '.join(sentence.split())
         content=cleaned_sentence
         return f"""
 Here resource has been put to start, but it will take some time to start in tenant {self.tenant_name} is {content}.
@@ -519,11 +1356,10 @@ When answering questions about starting all resources, use the stored informatio
 
 
 
-    def preprocess_message_for_token(self,messages: list)->str:
+    def preprocess_message_for_token(self,messages: Messages)->list:
         preprocessed_messages = []
-        messages_list = messages.get("messages", [])
-        # Set host_url and tenant_id from platform context
-        message= messages_list[-1].get("content", "")   
+        messages_list = messages.messages
+        message= messages_list[-1].content
         preprocessed_messages.append({
             "role": "user",
             "content": message
@@ -1,6 +1,6 @@
 from typing import Dict, Any, List
 from agent_server import AgentProtocol
-from schemas.messages import AgentMessage
+from schemas.messages import AgentMessage, Messages
 
 
 class EchoAgent(AgentProtocol):
@@ -12,4 +12,11 @@ class EchoAgent(AgentProtocol):
         last_user = next((m for m in reversed(messages_list) if m.get("role") == "user"), None)
         text = last_user.get("content", "") if last_user else "I heard nothing."
         
-        return AgentMessage(content=f"Echo: {text}")
\ No newline at end of file
+        return AgentMessage(content=f"Echo: {text}")
+
+    def invoke_typed(self, messages: Messages) -> AgentMessage:
+        # Same as invoke, reading the validated models directly
+        last_user = next((m for m in reversed(messages.messages) if m.role == "user"), None)
+        text = last_user.content if last_user else "I heard nothing."
+
+        return AgentMessage(content=f"Echo: {text}")
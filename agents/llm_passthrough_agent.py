@@ -1,6 +1,6 @@
 from typing import Dict, Any, List
 from agent_server import AgentProtocol
-from schemas.messages import AgentMessage
+from schemas.messages import AgentMessage, Messages
 from services.llm import BedrockAnthropicLLM
 import os
 
@@ -27,8 +27,17 @@ class LLMPassthroughAgent(AgentProtocol):
             elif message.get("role") == "assistant":
                 preprocessed_messages.append({"role": "assistant", "content": message.get("content", "")})
         return preprocessed_messages
+
+    def preprocess_typed_messages(self, messages: Messages):
+        # Validated models only carry user/assistant roles, so no filtering is needed
+        return [{"role": message.role, "content": message.content} for message in messages.messages]
         
     def invoke(self, messages: Dict[str, List[Dict[str, Any]]]) -> AgentMessage:
         preprocessed_messages = self.preprocess_messages(messages)
         content = self.call_bedrock_anthropic_llm(messages=preprocessed_messages)
-        return AgentMessage(content=content)
\ No newline at end of file
+        return AgentMessage(content=content)
+
+    def invoke_typed(self, messages: Messages) -> AgentMessage:
+        preprocessed_messages = self.preprocess_typed_messages(messages)
+        content = self.call_bedrock_anthropic_llm(messages=preprocessed_messages)
+        return AgentMessage(content=content)
@@ -0,0 +1,84 @@
+"""
+Benchmark of CommandAgent.process_messages on long conversations.
+
+Run with:   python benchmark_cmd_history.py [TURNS ...]
+
+Builds a synthetic history in which every turn resends all previously
+executed commands (as the clients do), then reports the time process_messages
+takes and the size of the prompt it produces, next to the size of the raw
+history it was given. Only the public process_messages API is used, so the
+same script measures any other revision as a baseline, e.g.:
+
+    git worktree add /tmp/baseline <revision> && cp benchmark_cmd_history.py /tmp/baseline/
+    (cd /tmp/baseline && python benchmark_cmd_history.py)
+"""
+import logging
+import sys
+import time
+from typing import Any, Dict, List
+
+from agents.cmd_agent import CommandAgent
+
+# One "kubectl get pods" output of about 6 KB per turn
+OUTPUT_LINES = 400
+
+
+def build_history(turns: int) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    A conversation of turns user/assistant exchanges followed by the current user message.
+    """
+    messages = []
+    executed = []
+    for turn in range(turns):
+        executed = executed + [{
+            "command": f"kubectl get pods -n ns{turn}",
+            "output": f"pod-{turn} Running\n" * OUTPUT_LINES,
+        }]
+        messages.append({"role": "user", "content": f"turn {turn}", "data": {"cmds": [], "executed_cmds": list(executed)}})
+        messages.append({
+            "role": "assistant",
+            "content": "ok",
+            "data": {"cmds": [{"command": "kubectl get pods", "execute": False}], "executed_cmds": list(executed)},
+        })
+    messages.append({"role": "user", "content": "now", "data": {"cmds": [], "executed_cmds": list(executed)}})
+    return {"messages": messages}
+
+
+def history_chars(history: Dict[str, List[Dict[str, Any]]]) -> int:
+    """Characters of command output carried by the user messages of the history."""
+    return sum(
+        len(cmd["output"])
+        for message in history["messages"] if message["role"] == "user"
+        for cmd in message["data"]["executed_cmds"]
+    )
+
+
+def run(turns: int, repeat: int = 3) -> Dict[str, Any]:
+    history = build_history(turns)
+    # process_messages does not use the LLM
+    agent = CommandAgent.__new__(CommandAgent)
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        processed, executed = agent.process_messages(history)
+        best = min(best, time.perf_counter() - started)
+    return {
+        "turns": turns,
+        "ms": best * 1000,
+        "history_chars": history_chars(history),
+        "prompt_chars": sum(len(message["content"]) for message in processed),
+        "latest_chars": len(processed[-1]["content"]),
+        "executed_cmds": len(executed),
+    }
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    turn_counts = [int(arg) for arg in sys.argv[1:]] or [25, 100, 200]
+    print(f"{'turns':>6} {'time':>10} {'history chars':>14} {'prompt chars':>13} {'latest msg':>11} {'cmds':>5}")
+    for turns in turn_counts:
+        result = run(turns)
+        print(
+            f"{result['turns']:>6} {result['ms']:>8.1f}ms {result['history_chars']:>14,} "
+            f"{result['prompt_chars']:>13,} {result['latest_chars']:>11,} {result['executed_cmds']:>5}"
+        )
@@ -1,32 +1,52 @@
 """
 Run with:   python main.py
 Or `uvicorn main:app --port 8000` if you prefer the CLI.
+
+The agent is chosen with AGENT (cost_optimiser, echo, llm_passthrough, cmd,
+boilerplate); only the selected agent's modules are imported. A comma-separated
+list (e.g. AGENT=cost_optimiser,cmd,llm_passthrough) serves every listed agent
+under /agents/{name}/..., the first one also at the unprefixed routes.
 """
+import time
+
+_started = time.perf_counter()
+
+import logging
+import os
 
-from agent_server import create_chat_app
-from services.llm import BedrockAnthropicLLM
-from agents.echo_agent import EchoAgent
-from agents.llm_passthrough_agent import LLMPassthroughAgent
-from agents.cmd_agent import CommandAgent
-from agents.boilerplate_agent import BoilerplateAgent
-from agents.cost_optimiser_agent import CostOptimiserAgent
 import dotenv
-import uvicorn
+
+from agent_server import create_chat_app, create_multi_agent_app
+from agents import DEFAULT_AGENT, load_agent, load_agents
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file and override existing ones
 dotenv.load_dotenv(override=True)
 
-# Choose which agent to use
-# agent = EchoAgent()
-#agent = LLMPassthroughAgent(BedrockAnthropicLLM())
-#agent = CommandAgent(BedrockAnthropicLLM())
-# agent = BoilerplateAgent()  # Default to the boilerplate agent
-agent = CostOptimiserAgent(BedrockAnthropicLLM())
-app = create_chat_app(agent)
+_imported = time.perf_counter()
+agent_names = [name.strip() for name in os.getenv("AGENT", DEFAULT_AGENT).split(",") if name.strip()]
+if len(agent_names) == 1:
+    agent = load_agent(agent_names[0])
+    _agent_ready = time.perf_counter()
+    app = create_chat_app(agent)
+else:
+    agents = load_agents(agent_names)
+    _agent_ready = time.perf_counter()
+    app = create_multi_agent_app(agents, default=agent_names[0])
+_app_ready = time.perf_counter()
+
+logger.info(
+    f"Startup: {', '.join(agent_names)} agent ready in {(_app_ready - _started) * 1000:.0f} ms "
+    f"(server imports {(_imported - _started) * 1000:.0f} ms, "
+    f"agent {(_agent_ready - _imported) * 1000:.0f} ms, "
+    f"app {(_app_ready - _agent_ready) * 1000:.0f} ms)"
+)
 
 
 if __name__ == "__main__":
-        
+    import uvicorn
+
     # For reload to work, we need to use an import string instead of the app object
     uvicorn.run(
         "main:app",
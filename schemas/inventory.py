@@ -0,0 +1,13 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class TenantRef(BaseModel):
+    duplo_base_url: str
+    tenant_id: str
+    tenant_name: Optional[str] = None
+
+
+class BatchInventoryRequest(BaseModel):
+    tenants: List[TenantRef] = Field(min_length=1)
@@ -7,6 +7,8 @@ from pydantic import BaseModel, Field, HttpUrl
 class Command(BaseModel):
     command: str
     execute: bool = False
+    # Does not depend on (or affect) the other commands of the turn, so it may run alongside them
+    independent: bool = False
     rejection_reason: Optional[str] = None
 
 
@@ -42,6 +44,9 @@ class Data(BaseModel):
     executed_cmds: List[ExecutedCommand] = Field(default_factory=list)
     url_configs: List[URLConfig] = Field(default_factory=list)
     tenant: Optional[Tenant] = None
+    job_id: Optional[str] = None
+    # Every job queued by the turn (job_id is the first of them)
+    job_ids: List[str] = Field(default_factory=list)
 
 class Message(BaseModel):
     role: Literal["user", "assistant"]
@@ -0,0 +1,59 @@
+import sys
+from dataclasses import dataclass
+from typing import Any, ClassVar, Optional, Union
+
+
+def intern_value(value: Any) -> Any:
+    """
+    Intern low-cardinality strings (states, engines, instance types) so every record shares one copy.
+    States are also lower-cased, the Duplo APIs are not consistent about casing.
+    """
+    if isinstance(value, str):
+        return sys.intern(value.lower())
+    return value
+
+
+@dataclass(slots=True)
+class Ec2Record:
+    resource_type: ClassVar[str] = "ec2"
+
+    name: Optional[str]
+    state: Optional[str]
+    instance_id: Optional[str] = None
+    instance_type: Optional[str] = None
+
+    @property
+    def key(self) -> Optional[str]:
+        return self.instance_id or self.name
+
+
+@dataclass(slots=True)
+class RdsRecord:
+    resource_type: ClassVar[str] = "rds"
+
+    name: Optional[str]
+    state: Optional[str]
+    engine: Optional[str] = None
+    size: Optional[int] = None
+    instance_class: Optional[str] = None
+
+    @property
+    def key(self) -> Optional[str]:
+        return self.name
+
+
+@dataclass(slots=True)
+class AsgRecord:
+    resource_type: ClassVar[str] = "asg"
+
+    name: Optional[str]
+    state: Optional[str]
+    instance_type: Optional[str] = None
+    desired_capacity: Optional[int] = None
+
+    @property
+    def key(self) -> Optional[str]:
+        return self.name
+
+
+ResourceRecord = Union[Ec2Record, RdsRecord, AsgRecord]
@@ -6,6 +6,7 @@ import copy
 import requests
 import logging
 import ast
+import uuid
 
 logging.basicConfig(
     format="%(asctime)s  %(levelname)s  %(name)s: %(message)s",
@@ -93,7 +94,13 @@ class ChatClient:
 		try:
 			# print("here is the payload to the API")
 			# print(payload)
-			resp = requests.post(self.endpoint, json=payload, timeout=30)
+			# One key per message: a retry after a timeout gets the original reply instead of re-running it
+			headers = {"Idempotency-Key": str(uuid.uuid4())}
+			try:
+				resp = requests.post(self.endpoint, json=payload, headers=headers, timeout=30)
+			except requests.Timeout:
+				logger.info("Request timed out, retrying with the same idempotency key")
+				resp = requests.post(self.endpoint, json=payload, headers=headers, timeout=30)
 
 			resp.raise_for_status()
 			body_text = resp.text.strip()
@@ -0,0 +1,131 @@
+"""
+Concurrent inventory fetches across many tenants.
+
+A batch fans tenants out over one shared worker pool (the global cap) while
+limiting how many tenants of the same Duplo host are fetched at once (the
+per-host cap, shared by every batch in the process). Results are yielded
+as each tenant completes, so callers can stream partial results instead of
+waiting for the slowest tenant.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (host_url, tenant_id, tenant_name)
+TenantRef = Tuple[str, str, str]
+
+
+@dataclass
+class TenantResult:
+    host_url: str
+    tenant_id: str
+    tenant_name: str
+    result: Any = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        payload = {
+            "host_url": self.host_url,
+            "tenant_id": self.tenant_id,
+            "tenant_name": self.tenant_name,
+            "status": "error" if self.error else "ok",
+            "elapsed": round(self.elapsed, 3),
+        }
+        if self.error:
+            payload["error"] = self.error
+        if isinstance(self.result, dict):
+            payload.update(self.result)
+        return payload
+
+
+class BatchFetcher:
+    """
+    Runs a per-tenant fetch for many tenants with global and per-host concurrency caps.
+    """
+
+    def __init__(self, max_workers: int = 32, per_host: int = 4, poll_interval: float = 0.5):
+        """
+        Initialize the fetcher.
+
+        Args:
+            max_workers: Maximum number of tenants fetched at once across all batches
+            per_host: Maximum number of tenants of one Duplo host fetched at once
+            poll_interval: How often a batch re-checks host capacity freed by other batches
+        """
+        self.per_host = per_host
+        self.poll_interval = poll_interval
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch-inventory")
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _slots(self, host_url: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            slots = self._host_slots.get(host_url)
+            if slots is None:
+                slots = self._host_slots[host_url] = threading.BoundedSemaphore(self.per_host)
+            return slots
+
+    def run(self, tenants: List[TenantRef], fetch: Callable[[str, str, str], Any]) -> Iterator[TenantResult]:
+        """
+        Fetch every tenant and yield the results in completion order.
+
+        Args:
+            tenants: (host_url, tenant_id, tenant_name) of each tenant
+            fetch: Called with host_url, tenant_id and tenant_name; its return value becomes the result
+
+        Returns:
+            An iterator of TenantResult, one per tenant; failures are reported, not raised
+        """
+        pending: Dict[str, Deque[TenantRef]] = {}
+        for tenant in tenants:
+            pending.setdefault(tenant[0], deque()).append(tenant)
+        completed: "queue.Queue[TenantResult]" = queue.Queue()
+
+        def execute(slots: threading.BoundedSemaphore, tenant: TenantRef) -> None:
+            host_url, tenant_id, tenant_name = tenant
+            started = time.monotonic()
+            result = TenantResult(host_url, tenant_id, tenant_name)
+            try:
+                result.result = fetch(host_url, tenant_id, tenant_name)
+            except Exception as e:
+                logger.error(f"Inventory of tenant {tenant_id} on {host_url} failed: {e}")
+                result.error = str(e)
+            finally:
+                slots.release()
+                result.elapsed = time.monotonic() - started
+                completed.put(result)
+
+        def dispatch() -> None:
+            for host_url, host_tenants in pending.items():
+                slots = self._slots(host_url)
+                while host_tenants and slots.acquire(blocking=False):
+                    self._pool.submit(execute, slots, host_tenants.popleft())
+
+        remaining = len(tenants)
+        while remaining:
+            dispatch()
+            try:
+                result = completed.get(timeout=self.poll_interval)
+            except queue.Empty:
+                continue
+            remaining -= 1
+            yield result
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Process-wide fetcher shared by every batch request
+default_fetcher = BatchFetcher(
+    max_workers=int(os.getenv("BATCH_INVENTORY_WORKERS", "32")),
+    per_host=int(os.getenv("BATCH_INVENTORY_PER_HOST", "4")),
+)
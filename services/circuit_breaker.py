@@ -0,0 +1,238 @@
+"""
+Circuit breakers for the Duplo APIs.
+
+Each (host_url, endpoint) pair has a breaker tracking the calls of a rolling
+window. When enough of them fail or are slow, the breaker opens and calls
+fail fast with CircuitOpenError instead of waiting for the request timeout.
+After a cooldown a limited number of probe calls are let through
+(half-open); a healthy probe closes the breaker, a failed one opens it again.
+Client errors (4xx) mean the host is answering, so they count as healthy.
+Latency is measured until the response arrives, not while its body is
+processed, so large but healthy payloads do not count as slow calls.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose breaker is open."""
+
+    def __init__(self, host_url: str, endpoint: str, retry_after: float):
+        super().__init__(f"Circuit open for {endpoint} on {host_url}, retry in {retry_after:.1f}s")
+        self.host_url = host_url
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+def _is_client_error(error: Exception) -> bool:
+    # requests.HTTPError and httpx.HTTPStatusError both carry the response
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(status, int) and 400 <= status < 500
+
+
+class CircuitBreaker:
+    """
+    Breaker of one endpoint, with rolling error-rate and latency windows.
+    """
+
+    def __init__(self, host_url: str, endpoint: str, window: float = 60, min_calls: int = 5,
+                 error_rate: float = 0.5, slow_call_seconds: float = 5, slow_call_rate: float = 0.5,
+                 cooldown: float = 30, half_open_probes: int = 1):
+        """
+        Initialize the breaker.
+
+        Args:
+            host_url: The Duplo host
+            endpoint: Name of the endpoint (e.g. "ec2:list")
+            window: Seconds of call history the rates are computed over
+            min_calls: Calls needed in the window before the breaker may open
+            error_rate: Failed fraction of the window that opens the breaker
+            slow_call_seconds: Calls taking at least this long count as slow
+            slow_call_rate: Slow fraction of the window that opens the breaker
+            cooldown: Seconds the breaker stays open before probing
+            half_open_probes: Concurrent probe calls allowed while half-open
+        """
+        self.host_url = host_url
+        self.endpoint = endpoint
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.cooldown = cooldown
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._probes = 0
+        # (finished_at, failed, latency), oldest first; the counters cover the same calls
+        self._calls: Deque[Tuple[float, bool, float]] = deque()
+        self._failures = 0
+        self._slow = 0
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        while self._calls and self._calls[0][0] < now - self.window:
+            _, failed, latency = self._calls.popleft()
+            self._failures -= failed
+            self._slow -= latency >= self.slow_call_seconds
+
+    def _open(self, now: float) -> None:
+        if self.state != OPEN:
+            logger.warning(
+                f"Circuit opened for {self.endpoint} on {self.host_url} "
+                f"({self._failures}/{len(self._calls)} failed, {self._slow} slow)"
+            )
+        self.state = OPEN
+        self.opened_at = now
+
+    def _acquire(self) -> bool:
+        # Returns whether the call was admitted as a half-open probe
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                remaining = self.cooldown - (now - self.opened_at)
+                if remaining > 0:
+                    raise CircuitOpenError(self.host_url, self.endpoint, remaining)
+                self.state = HALF_OPEN
+                self._probes = 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    raise CircuitOpenError(self.host_url, self.endpoint, 0)
+                self._probes += 1
+                return True
+            return False
+
+    def _record(self, failed: bool, latency: float, probe: bool) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slow = latency >= self.slow_call_seconds
+            # Only probes decide the half-open state; calls admitted earlier are just counted
+            if probe and self.state == HALF_OPEN:
+                self._probes -= 1
+                if failed or slow:
+                    self._open(now)
+                    return
+                logger.info(f"Circuit closed for {self.endpoint} on {self.host_url}")
+                self.state = CLOSED
+                self._calls.clear()
+                self._failures = self._slow = 0
+
+            self._calls.append((now, failed, latency))
+            self._failures += failed
+            self._slow += slow
+            self._prune(now)
+            calls = len(self._calls)
+            if self.state == CLOSED and calls >= self.min_calls and (
+                self._failures / calls >= self.error_rate or self._slow / calls >= self.slow_call_rate
+            ):
+                self._open(now)
+
+    def call(self, fn: Callable[[], Any], then: Optional[Callable[[Any], Any]] = None) -> Any:
+        """
+        Call fn through the breaker.
+
+        Args:
+            fn: The call to the endpoint (e.g. the request, returning the response once its headers arrive)
+            then: Optional processing of fn's result (e.g. reading the body); its failures count
+                against the endpoint but its duration does not
+
+        Raises:
+            CircuitOpenError: When the breaker is open (fn is not called)
+        """
+        probe = self._acquire()
+        started = time.monotonic()
+        latency = None
+        try:
+            result = fn()
+            latency = time.monotonic() - started
+            if then is not None:
+                result = then(result)
+        except Exception as e:
+            self._record(not _is_client_error(e), latency if latency is not None else time.monotonic() - started, probe)
+            raise
+        self._record(False, latency, probe)
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            calls = len(self._calls)
+            latencies = sorted(latency for _, _, latency in self._calls)
+            snapshot = {
+                "host_url": self.host_url,
+                "endpoint": self.endpoint,
+                "state": self.state,
+                "calls": calls,
+                "error_rate": round(self._failures / calls, 3) if calls else 0.0,
+                "slow_rate": round(self._slow / calls, 3) if calls else 0.0,
+                "p50_latency": round(latencies[calls // 2], 3) if calls else None,
+                "p95_latency": round(latencies[min(calls - 1, int(calls * 0.95))], 3) if calls else None,
+            }
+            if self.state == OPEN:
+                snapshot["retry_after"] = round(max(0.0, self.cooldown - (now - self.opened_at)), 1)
+            return snapshot
+
+
+class CircuitBreakers:
+    """
+    Registry of breakers, one per (host_url, endpoint).
+    """
+
+    def __init__(self, enabled: bool = True, **settings):
+        """
+        Initialize the registry.
+
+        Args:
+            enabled: When False, calls go straight through
+            settings: Passed to every CircuitBreaker (window, min_calls, error_rate, ...)
+        """
+        self.enabled = enabled
+        self.settings = settings
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host_url: str, endpoint: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get((host_url, endpoint))
+            if breaker is None:
+                breaker = self._breakers[(host_url, endpoint)] = CircuitBreaker(host_url, endpoint, **self.settings)
+            return breaker
+
+    def call(self, host_url: str, endpoint: str, fn: Callable[[], Any],
+             then: Optional[Callable[[Any], Any]] = None) -> Any:
+        """
+        Call fn (then then, see CircuitBreaker.call) through the breaker of (host_url, endpoint).
+        """
+        if not self.enabled:
+            result = fn()
+            return then(result) if then is not None else result
+        return self.get(host_url, endpoint).call(fn, then)
+
+    def health(self) -> List[Dict[str, Any]]:
+        """Snapshot of every breaker, for the health endpoint."""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return [breaker.snapshot() for breaker in breakers]
+
+
+# Process-wide breakers shared by every agent and background sync
+default_breakers = CircuitBreakers(
+    enabled=os.getenv("CIRCUIT_BREAKER", "true").lower() in ("1", "true", "yes"),
+    window=float(os.getenv("CIRCUIT_WINDOW", "60")),
+    min_calls=int(os.getenv("CIRCUIT_MIN_CALLS", "5")),
+    error_rate=float(os.getenv("CIRCUIT_ERROR_RATE", "0.5")),
+    slow_call_seconds=float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", "5")),
+    slow_call_rate=float(os.getenv("CIRCUIT_SLOW_CALL_RATE", "0.5")),
+    cooldown=float(os.getenv("CIRCUIT_COOLDOWN", "30")),
+)
@@ -0,0 +1,189 @@
+"""
+Short-lived cache of read-only command results.
+
+Users often re-approve the same `kubectl get` / `aws ... describe-*` commands
+within minutes. Results of such commands are kept for a short TTL, keyed on
+the command and the environment that decides what it talks to (kubeconfig,
+AWS profile/region/credentials, working directory), and concurrent runs of
+the same command share one execution: callers joining a running command get
+the output it streamed so far, then the rest as it arrives. Disabled unless
+COMMAND_CACHE_TTL is set.
+"""
+import logging
+import os
+import shlex
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services.command_runner import CommandResult, is_read_only
+
+logger = logging.getLogger(__name__)
+
+# Only read-only commands of these programs are cached; their output is worth reusing for a few minutes
+_CACHEABLE_PROGRAMS = {"kubectl", "aws"}
+_CONTEXT_ENV = (
+    "KUBECONFIG",
+    "AWS_PROFILE",
+    "AWS_REGION",
+    "AWS_DEFAULT_REGION",
+    "AWS_ACCESS_KEY_ID",
+    "AWS_SESSION_TOKEN",
+)
+
+
+def is_cacheable(command: str) -> bool:
+    """Whether the output of a command may be served from the cache."""
+    if not is_read_only(command):
+        return False
+    return shlex.split(command)[0] in _CACHEABLE_PROGRAMS
+
+
+def _kubeconfig_version() -> Tuple[float, ...]:
+    # Switching context rewrites the kubeconfig, so its modification time is part of the key
+    paths = os.getenv("KUBECONFIG") or os.path.expanduser("~/.kube/config")
+    versions = []
+    for path in paths.split(os.pathsep):
+        try:
+            versions.append(os.stat(path).st_mtime)
+        except OSError:
+            versions.append(0.0)
+    return tuple(versions)
+
+
+class _RunningCommand:
+    """
+    One in-flight command shared by its callers, with the output it streamed so far.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[CommandResult] = None
+        self.error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+        self._chunks: List[Tuple[str, str]] = []
+        self._listeners: List[Callable[[str, str], None]] = []
+
+    def subscribe(self, listener: Callable[[str, str], None]) -> None:
+        # Replayed under the lock so no chunk is missed or delivered out of order
+        with self._lock:
+            for stream, text in self._chunks:
+                self._deliver(listener, stream, text)
+            self._listeners.append(listener)
+
+    def publish(self, stream: str, text: str) -> None:
+        with self._lock:
+            self._chunks.append((stream, text))
+            for listener in self._listeners:
+                self._deliver(listener, stream, text)
+
+    @staticmethod
+    def _deliver(listener: Callable[[str, str], None], stream: str, text: str) -> None:
+        try:
+            listener(stream, text)
+        except Exception as e:
+            logger.error(f"Command output listener failed: {e}")
+
+
+class CommandCache:
+    """
+    TTL + LRU cache of command results, keyed on command and execution context.
+    """
+
+    def __init__(self, ttl: float = 0, max_entries: int = 256):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl: Seconds a result stays valid (0 disables the cache)
+            max_entries: Maximum number of results kept, least recently used are evicted
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Tuple[float, CommandResult]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._running: Dict[tuple, _RunningCommand] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _key(self, command: str) -> tuple:
+        return (
+            command,
+            os.getcwd(),
+            tuple(os.getenv(name) for name in _CONTEXT_ENV),
+            _kubeconfig_version(),
+        )
+
+    def get_or_run(
+        self,
+        command: str,
+        run: Callable[[Callable[[str, str], None]], CommandResult],
+        on_output: Optional[Callable[[str, str], None]] = None,
+    ) -> Tuple[CommandResult, Optional[float]]:
+        """
+        Return the cached result of a command, or run it and cache the result.
+
+        Args:
+            command: The command string (already known to be cacheable)
+            run: Runs the command when no fresh result is cached, forwarding its output chunks
+                to the callback it is given
+            on_output: Receives the (stream, text) chunks of the run, also when joining a run
+                already in progress (its earlier chunks are replayed first); not called for cached results
+
+        Returns:
+            The result and its age in seconds, or None for the age when the command was just run
+        """
+        key = self._key(command)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, result = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    return result, now - stored_at
+                del self._entries[key]
+            running = self._running.get(key)
+            leader = running is None
+            if leader:
+                running = self._running[key] = _RunningCommand()
+
+        if on_output:
+            running.subscribe(on_output)
+        if not leader:
+            running.done.wait()
+            if running.error is not None:
+                raise running.error
+            return running.result, None
+
+        try:
+            running.result = run(running.publish)
+            return running.result, None
+        except BaseException as e:
+            running.error = e
+            raise
+        finally:
+            result = running.result
+            with self._lock:
+                del self._running[key]
+                # Failures and cut-off output are not worth reusing
+                if result is not None and result.exit_code == 0 and not result.timed_out and not result.output_limited:
+                    self._entries[key] = (time.monotonic(), result)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            running.done.set()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Process-wide cache shared by every command agent
+default_cache = CommandCache(
+    ttl=float(os.getenv("COMMAND_CACHE_TTL", "0")),
+    max_entries=int(os.getenv("COMMAND_CACHE_MAX_ENTRIES", "256")),
+)
@@ -0,0 +1,288 @@
+"""
+Bounded execution of shell commands.
+
+Commands run with their stdout/stderr read incrementally by two pump
+threads. Each stream keeps only a head and a tail window of its output, the
+command is stopped when it exceeds the wall-clock timeout or produces more
+than the byte limit, and every chunk can be forwarded to a callback as it
+arrives (to stream progress to the client). Read-only commands are
+recognised so that callers can run them concurrently on the shared pool.
+"""
+import codecs
+import logging
+import os
+import re
+import shlex
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+COMMAND_TIMEOUT = float(os.getenv("COMMAND_TIMEOUT", "120"))
+COMMAND_OUTPUT_HEAD_BYTES = int(os.getenv("COMMAND_OUTPUT_HEAD_BYTES", str(16 * 1024)))
+COMMAND_OUTPUT_TAIL_BYTES = int(os.getenv("COMMAND_OUTPUT_TAIL_BYTES", str(16 * 1024)))
+COMMAND_MAX_OUTPUT_BYTES = int(os.getenv("COMMAND_MAX_OUTPUT_BYTES", str(64 * 1024 * 1024)))
+# Independent commands of one turn run concurrently on at most this many workers (1 runs them in sequence)
+COMMAND_PARALLEL_WORKERS = int(os.getenv("COMMAND_PARALLEL_WORKERS", "4"))
+
+_CHUNK_SIZE = 64 * 1024
+# Seconds allowed for draining the pipes once the command is over, even past its timeout
+_DRAIN_GRACE = 1.0
+
+
+class OutputWindow:
+    """
+    Keeps the first head_bytes and the last tail_bytes written, counting everything in between.
+    """
+
+    def __init__(self, head_bytes: int, tail_bytes: int):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def write(self, chunk: bytes) -> None:
+        self.total += len(chunk)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk and self.tail_bytes:
+            self.tail += chunk
+            # Trimmed in batches so the copy is amortised over many writes
+            if len(self.tail) > 2 * self.tail_bytes:
+                del self.tail[:-self.tail_bytes]
+
+    @property
+    def omitted(self) -> int:
+        return self.total - len(self.head) - min(len(self.tail), self.tail_bytes)
+
+    def text(self) -> str:
+        tail = bytes(self.tail[-self.tail_bytes:]) if self.tail_bytes else b""
+        if self.omitted > 0:
+            return (
+                self.head.decode("utf-8", "replace")
+                + f"\n... [{self.omitted} bytes omitted] ...\n"
+                + tail.decode("utf-8", "replace")
+            )
+        return (bytes(self.head) + tail).decode("utf-8", "replace")
+
+
+@dataclass
+class CommandResult:
+    command: str
+    exit_code: Optional[int]
+    stdout: str
+    stderr: str
+    elapsed: float
+    timed_out: bool = False
+    output_limited: bool = False
+    truncated: bool = False
+
+    def output_text(self) -> str:
+        """
+        stdout followed by stderr, with notices about limits that were hit.
+        """
+        output = self.stdout
+        if self.stderr:
+            if output:
+                output += f"\n\nErrors:\n{self.stderr}"
+            else:
+                output = f"Errors:\n{self.stderr}"
+        notice = None
+        if self.timed_out:
+            notice = f"[Command timed out after {self.elapsed:.0f}s and was stopped]"
+        elif self.output_limited:
+            notice = "[Command produced too much output and was stopped]"
+        elif self.exit_code:
+            notice = f"Exit code: {self.exit_code}"
+        if notice:
+            output = f"{output}\n\n{notice}" if output else notice
+        if not output:
+            output = "Command executed successfully with no output."
+        return output
+
+
+def _kill(process: subprocess.Popen) -> None:
+    try:
+        if os.name == "posix":
+            # The command runs in its own session, stop the whole group (shell and children)
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def run_command(
+    command: str,
+    timeout: Optional[float] = None,
+    head_bytes: Optional[int] = None,
+    tail_bytes: Optional[int] = None,
+    max_output_bytes: Optional[int] = None,
+    on_output: Optional[Callable[[str, str], None]] = None,
+) -> CommandResult:
+    """
+    Run a shell command with a timeout and bounded output.
+
+    Args:
+        command: The command string, run through the shell
+        timeout: Wall-clock seconds before the command is killed (COMMAND_TIMEOUT by default)
+        head_bytes: Bytes kept from the start of each stream (COMMAND_OUTPUT_HEAD_BYTES)
+        tail_bytes: Bytes kept from the end of each stream (COMMAND_OUTPUT_TAIL_BYTES)
+        max_output_bytes: Total bytes after which the command is killed (COMMAND_MAX_OUTPUT_BYTES)
+        on_output: Called with ("stdout" | "stderr", text) for every chunk read
+
+    Processes the command leaves running in the background are stopped with it.
+
+    Returns:
+        The command result; spawning failures raise OSError
+    """
+    timeout = COMMAND_TIMEOUT if timeout is None else timeout
+    max_output_bytes = COMMAND_MAX_OUTPUT_BYTES if max_output_bytes is None else max_output_bytes
+    windows: Dict[str, OutputWindow] = {
+        name: OutputWindow(
+            COMMAND_OUTPUT_HEAD_BYTES if head_bytes is None else head_bytes,
+            COMMAND_OUTPUT_TAIL_BYTES if tail_bytes is None else tail_bytes,
+        )
+        for name in ("stdout", "stderr")
+    }
+    over_limit = threading.Event()
+    counter_lock = threading.Lock()
+    read_total = [0]
+
+    started = time.monotonic()
+    process = subprocess.Popen(
+        command,
+        shell=True,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=os.name == "posix",
+    )
+
+    def pump(name: str, pipe) -> None:
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        try:
+            while True:
+                chunk = pipe.read1(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                windows[name].write(chunk)
+                with counter_lock:
+                    read_total[0] += len(chunk)
+                    exceeded = read_total[0] > max_output_bytes
+                if on_output:
+                    try:
+                        on_output(name, decoder.decode(chunk))
+                    except Exception as e:
+                        logger.error(f"Command output callback failed: {e}")
+                if exceeded:
+                    over_limit.set()
+                    break
+        finally:
+            pipe.close()
+
+    pumps = [
+        threading.Thread(target=pump, args=(name, pipe), name=f"cmd-{name}", daemon=True)
+        for name, pipe in (("stdout", process.stdout), ("stderr", process.stderr))
+    ]
+    for thread in pumps:
+        thread.start()
+
+    timed_out = False
+    while process.poll() is None:
+        if over_limit.wait(0.05):
+            _kill(process)
+            break
+        if time.monotonic() - started > timeout:
+            timed_out = True
+            _kill(process)
+            break
+    exit_code = process.wait()
+    # Children the command left behind in its group (e.g. "cmd &") would keep the pipes open
+    _kill(process)
+    # Output still buffered in the pipes is drained before the result is built, within the command's
+    # deadline: a child that left the group may hold the pipes, its pump is then abandoned
+    drain_until = max(started + timeout, time.monotonic() + _DRAIN_GRACE)
+    for thread in pumps:
+        thread.join(timeout=max(0.0, drain_until - time.monotonic()))
+
+    elapsed = time.monotonic() - started
+    if timed_out or over_limit.is_set():
+        logger.warning(
+            f"Command stopped after {elapsed:.1f}s ({'timeout' if timed_out else 'output limit'}): {command}"
+        )
+    return CommandResult(
+        command=command,
+        exit_code=exit_code,
+        stdout=windows["stdout"].text(),
+        stderr=windows["stderr"].text(),
+        elapsed=elapsed,
+        timed_out=timed_out,
+        output_limited=over_limit.is_set(),
+        truncated=any(window.omitted > 0 for window in windows.values()),
+    )
+
+
+# ----- read-only detection ----------------------------------------------------
+
+# Shell syntax that chains, redirects or substitutes commands is never treated as read-only
+_UNSAFE_SHELL = re.compile(r"[;&<>`\n]|\$\(")
+_READ_ONLY_PROGRAMS = {"ls", "cat", "pwd", "whoami", "date", "df", "ps", "uname", "echo"}
+_PIPE_FILTERS = {"grep", "egrep", "head", "tail", "wc", "jq", "cut", "uniq", "column"}
+_KUBECTL_READ_VERBS = {"get", "describe", "logs", "top", "explain", "version", "api-resources", "cluster-info"}
+_KUBECTL_VALUE_FLAGS = {"-n", "--namespace", "--context", "--kubeconfig", "--cluster", "--user"}
+_AWS_VALUE_FLAGS = {"--region", "--profile", "--output", "--endpoint-url", "--query"}
+_AWS_READ_PREFIXES = ("describe-", "list-", "get-")
+
+
+def _positionals(args: List[str], value_flags: set) -> List[str]:
+    positionals, skip = [], False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg in value_flags:
+            skip = True
+        elif not arg.startswith("-"):
+            positionals.append(arg)
+    return positionals
+
+
+def _is_read_only_segment(args: List[str]) -> bool:
+    program, rest = args[0], args[1:]
+    if program == "kubectl":
+        verbs = _positionals(rest, _KUBECTL_VALUE_FLAGS)
+        return bool(verbs) and verbs[0] in _KUBECTL_READ_VERBS
+    if program == "aws":
+        service_op = _positionals(rest, _AWS_VALUE_FLAGS)
+        if service_op[:1] == ["s3"]:
+            return service_op[1:2] == ["ls"]
+        return len(service_op) >= 2 and service_op[1].startswith(_AWS_READ_PREFIXES)
+    return program in _READ_ONLY_PROGRAMS
+
+
+def is_read_only(command: str) -> bool:
+    """
+    Whether a command only reads state (kubectl get/describe/logs, aws describe-/list-/get-,
+    a few inspection programs), optionally piped through text filters.
+    """
+    if _UNSAFE_SHELL.search(command):
+        return False
+    try:
+        segments = [shlex.split(segment) for segment in command.split("|")]
+    except ValueError:
+        return False
+    if not segments or any(not args for args in segments):
+        return False
+    return _is_read_only_segment(segments[0]) and all(args[0] in _PIPE_FILTERS for args in segments[1:])
+
+
+# Process-wide pool that runs independent commands concurrently (each command is its own process)
+default_pool = ThreadPoolExecutor(max_workers=max(1, COMMAND_PARALLEL_WORKERS), thread_name_prefix="cmd-runner")
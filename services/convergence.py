@@ -0,0 +1,292 @@
+"""
+State convergence tracking after stop/start.
+
+After a stop/start is issued, a watcher per tenant polls only the affected
+resources until they reach the desired state (or a timeout), with
+exponential backoff. Pending resources of one type are checked with a
+single list call per poll, and new targets for a tenant that is already
+being watched are merged into the running watcher rather than starting
+another poller. Completion is published as ConvergenceEvents; recent events
+and the number of resources still pending are reported with state listings.
+
+Waiting between polls costs no thread: one timer thread keeps the next poll
+deadline of every watcher in a heap and hands the due polls to a bounded pool.
+"""
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONVERGED = "converged"
+REMOVED = "removed"
+TIMED_OUT = "timed_out"
+
+
+@dataclass
+class ConvergenceEvent:
+    host_url: str
+    tenant_id: str
+    resource_type: str
+    key: str
+    desired_state: str
+    state: Optional[str]
+    outcome: str  # converged | removed | timed_out
+    elapsed: float
+    finished_at: float = field(default_factory=time.time)
+
+
+class EventBus:
+    """
+    Minimal synchronous publish/subscribe for convergence events.
+    """
+
+    def __init__(self):
+        self._subscribers: List[Callable[[ConvergenceEvent], None]] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: Callable[[ConvergenceEvent], None]) -> None:
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def publish(self, event: ConvergenceEvent) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Convergence subscriber failed: {e}")
+
+
+class ConvergenceWatcher:
+    """
+    Polls one tenant's pending resources until each reaches its desired state.
+    """
+
+    def __init__(
+        self,
+        host_url: str,
+        tenant_id: str,
+        resource: Any,
+        bus: EventBus,
+        initial_delay: float = 5.0,
+        max_delay: float = 60.0,
+        timeout: float = 900.0,
+    ):
+        """
+        Initialize the watcher.
+
+        Args:
+            host_url: Duplo base URL of the tenant
+            tenant_id: Tenant ID
+            resource: A Resource bound to the tenant, used for get_<type>_state
+            bus: Where completion events are published
+            initial_delay: Seconds before the first poll
+            max_delay: Upper bound of the backoff between polls
+            timeout: Seconds after which a pending resource is reported as timed out
+        """
+        self.host_url = host_url
+        self.tenant_id = tenant_id
+        self.resource = resource
+        self.bus = bus
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        # resource_type -> key -> (desired_state, watched_since)
+        self._pending: Dict[str, Dict[str, Tuple[str, float]]] = {}
+        self._lock = threading.Lock()
+        self._delay = initial_delay
+        self._finished = False
+        # Scheduling state, owned by the tracker: deadline of the next poll and whether one is running
+        self.due = 0.0
+        self.polling = False
+
+    def add(self, targets: Dict[str, Dict[str, str]]) -> bool:
+        """
+        Merge targets (resource_type -> key -> desired state) into the pending set.
+
+        Returns:
+            False if the watcher already finished and a new one is needed
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._finished:
+                return False
+            for resource_type, keys in targets.items():
+                pending = self._pending.setdefault(resource_type, {})
+                for key, desired_state in keys.items():
+                    pending[key] = (desired_state, now)
+            # New work: poll soon again rather than after the backed-off delay
+            self._delay = self.initial_delay
+        return True
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return sum(len(pending) for pending in self._pending.values())
+
+    def next_delay(self) -> Optional[float]:
+        """
+        Seconds until the next poll (backing off after each one), or None when nothing is pending
+        and the watcher is finished.
+        """
+        with self._lock:
+            if not any(self._pending.values()):
+                self._finished = True
+                return None
+            self._delay = min(self._delay * 2, self.max_delay)
+            return self._delay
+
+    def poll_once(self) -> None:
+        """
+        Check every pending resource type with one list call each and publish completions.
+        """
+        with self._lock:
+            types = [t for t, pending in self._pending.items() if pending]
+        for resource_type in types:
+            try:
+                records = getattr(self.resource, f"get_{resource_type}_state")(raise_errors=True)
+            except Exception as e:
+                logger.error(f"Convergence poll of {resource_type} failed for tenant {self.tenant_id}: {e}")
+                records = None
+            states = {record.key: record.state for record in records} if records is not None else None
+
+            now = time.monotonic()
+            events = []
+            with self._lock:
+                pending = self._pending.get(resource_type, {})
+                for key, (desired_state, since) in list(pending.items()):
+                    if states is not None and key not in states:
+                        outcome, state = REMOVED, None
+                    elif states is not None and states[key] == desired_state:
+                        outcome, state = CONVERGED, states[key]
+                    elif now - since > self.timeout:
+                        outcome, state = TIMED_OUT, states.get(key) if states else None
+                    else:
+                        continue
+                    del pending[key]
+                    events.append(ConvergenceEvent(
+                        self.host_url, self.tenant_id, resource_type, key, desired_state, state, outcome, now - since
+                    ))
+            for event in events:
+                self.bus.publish(event)
+
+
+class ConvergenceTracker:
+    """
+    One watcher per (host_url, tenant_id), polled on a bounded pool when its next poll is due.
+    """
+
+    def __init__(self, max_workers: int = 8, history_size: int = 500, **watcher_options):
+        self.bus = EventBus()
+        self.watcher_options = watcher_options
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="convergence")
+        self._watchers: Dict[Tuple[str, str], ConvergenceWatcher] = {}
+        self._lock = threading.Lock()
+        # (due, sequence, key); entries whose due no longer matches their watcher are stale and skipped
+        self._schedule: List[Tuple[float, int, Tuple[str, str]]] = []
+        self._sequence = itertools.count()
+        self._wakeup = threading.Condition(self._lock)
+        self._timer: Optional[threading.Thread] = None
+        self._recent: Deque[ConvergenceEvent] = deque(maxlen=history_size)
+        self.bus.subscribe(self._record)
+
+    def _record(self, event: ConvergenceEvent) -> None:
+        logger.info(
+            f"{event.resource_type} {event.key} in tenant {event.tenant_id}: {event.outcome} "
+            f"({event.state}, wanted {event.desired_state}) after {event.elapsed:.0f}s"
+        )
+        self._recent.append(event)
+
+    def watch(
+        self,
+        host_url: str,
+        tenant_id: str,
+        resource_factory: Callable[[], Any],
+        targets: Dict[str, Dict[str, str]],
+    ) -> None:
+        """
+        Track targets (resource_type -> key -> desired state) until they converge.
+        """
+        if not any(targets.values()):
+            return
+        key = (host_url, tenant_id)
+        with self._lock:
+            watcher = self._watchers.get(key)
+            if watcher is not None and watcher.add(targets):
+                # New work: poll soon rather than after the backed-off delay (a running poll reschedules itself)
+                if not watcher.polling and watcher.due > time.monotonic() + watcher.initial_delay:
+                    self._schedule_poll(key, watcher, watcher.initial_delay)
+                return
+            watcher = ConvergenceWatcher(host_url, tenant_id, resource_factory(), self.bus, **self.watcher_options)
+            watcher.add(targets)
+            self._watchers[key] = watcher
+            self._schedule_poll(key, watcher, watcher.initial_delay)
+
+    def _schedule_poll(self, key: Tuple[str, str], watcher: ConvergenceWatcher, delay: float) -> None:
+        # Called with self._lock held
+        watcher.due = time.monotonic() + delay
+        heapq.heappush(self._schedule, (watcher.due, next(self._sequence), key))
+        if self._timer is None:
+            self._timer = threading.Thread(target=self._run_timer, name="convergence-timer", daemon=True)
+            self._timer.start()
+        self._wakeup.notify()
+
+    def _run_timer(self) -> None:
+        with self._lock:
+            while self._schedule:
+                now = time.monotonic()
+                while self._schedule and self._schedule[0][0] <= now:
+                    due, _, key = heapq.heappop(self._schedule)
+                    watcher = self._watchers.get(key)
+                    if watcher is None or watcher.due != due or watcher.polling:
+                        continue
+                    watcher.polling = True
+                    self._pool.submit(self._poll, key, watcher)
+                if self._schedule:
+                    self._wakeup.wait(self._schedule[0][0] - now)
+            # Nothing scheduled: the next watch starts a new timer
+            self._timer = None
+
+    def _poll(self, key: Tuple[str, str], watcher: ConvergenceWatcher) -> None:
+        try:
+            watcher.poll_once()
+        except Exception as e:
+            logger.error(f"Convergence watcher for tenant {watcher.tenant_id} failed: {e}")
+        with self._lock:
+            watcher.polling = False
+            delay = watcher.next_delay()
+            if delay is not None:
+                self._schedule_poll(key, watcher, delay)
+            elif self._watchers.get(key) is watcher:
+                del self._watchers[key]
+
+    def recent_events(self, host_url: str, tenant_id: str, since: float = 0.0) -> List[ConvergenceEvent]:
+        """Completions of a tenant finished after since (epoch seconds), oldest first."""
+        return [
+            e for e in list(self._recent)
+            if e.host_url == host_url and e.tenant_id == tenant_id and e.finished_at >= since
+        ]
+
+    def pending(self, host_url: str, tenant_id: str) -> int:
+        """Resources of a tenant still being watched."""
+        with self._lock:
+            watcher = self._watchers.get((host_url, tenant_id))
+        return watcher.pending_count() if watcher else 0
+
+
+# Process-wide tracker, disabled with CONVERGENCE_WATCH=false
+CONVERGENCE_WATCH = os.getenv("CONVERGENCE_WATCH", "true").lower() in ("1", "true", "yes")
+default_tracker = ConvergenceTracker(
+    max_workers=int(os.getenv("CONVERGENCE_WORKERS", "8")),
+    initial_delay=float(os.getenv("CONVERGENCE_INITIAL_DELAY", "5")),
+    max_delay=float(os.getenv("CONVERGENCE_MAX_DELAY", "60")),
+    timeout=float(os.getenv("CONVERGENCE_TIMEOUT", "900")),
+)
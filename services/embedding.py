@@ -1,8 +1,6 @@
-import boto3
 import os
 import logging
 from typing import List
-from langchain_community.embeddings import BedrockEmbeddings
 import dotenv
 
 logger = logging.getLogger(__name__)
@@ -46,6 +44,10 @@ class BedrockEmbeddingProvider:
             batch_size: Number of texts to embed in a single batch
             **kwargs: Additional arguments for the Bedrock client
         """
+        # Imported here: boto3 and langchain_community are slow to import and only needed for embeddings
+        import boto3
+        from langchain_community.embeddings import BedrockEmbeddings
+
         self.model_id = model_id
         self.region_name = region_name
         self.batch_size = batch_size
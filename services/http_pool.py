@@ -0,0 +1,175 @@
+"""
+Shared HTTP connection pool.
+
+Every agent served by the process talks to the Duplo APIs through one
+requests.Session, so TCP/TLS connections are reused across chat turns,
+background syncs and agents instead of being opened per call. Responses are
+requested compressed (gzip/deflate, plus br when brotli is installed).
+
+With HTTP_CLIENT=http2 (and httpx[http2] installed) the session is backed by
+an HTTP/2 httpx client instead, multiplexing concurrent requests to the same
+host over one connection. It exposes the subset of the requests API the
+agents use.
+"""
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterator, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+_session: Optional[Union[requests.Session, "Http2Session"]] = None
+_lock = threading.Lock()
+
+
+def _accept_encoding() -> str:
+    encodings = ["gzip", "deflate"]
+    # urllib3 (and httpx) only decode brotli when one of these modules is installed
+    for module in ("brotli", "brotlicffi"):
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        encodings.append("br")
+        break
+    return ", ".join(encodings)
+
+
+class _DecodedStream:
+    """
+    Minimal file-like view (read) of a streamed httpx response body, already decompressed.
+    """
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._buffer = b""
+        # Accepted for compatibility with urllib3's raw stream; httpx always decodes
+        self.decode_content = True
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+class _Http2Response:
+    """
+    The part of the requests.Response interface used by the agents, over an httpx response.
+    """
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.raw = _DecodedStream(response.iter_bytes())
+
+    @property
+    def content(self) -> bytes:
+        return self._response.read()
+
+    @property
+    def text(self) -> str:
+        self._response.read()
+        return self._response.text
+
+    def json(self) -> Any:
+        self._response.read()
+        return self._response.json()
+
+    def raise_for_status(self) -> None:
+        self._response.raise_for_status()
+
+    def close(self) -> None:
+        self._response.close()
+
+    def __enter__(self) -> "_Http2Response":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class Http2Session:
+    """
+    requests.Session-like wrapper over HTTP/2 httpx clients (one per TLS verification setting).
+    """
+
+    def __init__(self, pool_size: int):
+        import httpx
+
+        self._httpx = httpx
+        self._limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self._clients: Dict[bool, "httpx.Client"] = {}
+        self._lock = threading.Lock()
+        self.headers = {"Accept-Encoding": _accept_encoding()}
+
+    def _client(self, verify: bool):
+        with self._lock:
+            client = self._clients.get(verify)
+            if client is None:
+                client = self._clients[verify] = self._httpx.Client(
+                    http2=True, verify=verify, limits=self._limits, headers=self.headers
+                )
+            return client
+
+    def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                timeout: Optional[float] = None, verify: bool = True, stream: bool = False,
+                data: Any = None, json: Any = None, params: Optional[Dict[str, Any]] = None) -> _Http2Response:
+        client = self._client(verify)
+        # requests sends str/bytes data as the raw body; httpx calls that content
+        body = {"content": data} if isinstance(data, (str, bytes)) else {"data": data}
+        request = client.build_request(method, url, headers=headers, params=params, json=json,
+                                       timeout=timeout, **body)
+        return _Http2Response(client.send(request, stream=stream))
+
+    def get(self, url: str, **kwargs) -> _Http2Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> _Http2Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+
+
+def _create_session(pool_size: int) -> Union[requests.Session, Http2Session]:
+    if os.getenv("HTTP_CLIENT", "requests").lower() == "http2":
+        try:
+            import h2  # noqa: F401  (httpx needs it for http2=True)
+
+            logger.info("Using HTTP/2 client for outbound API calls")
+            return Http2Session(pool_size)
+        except ImportError:
+            logger.warning("HTTP_CLIENT=http2 needs httpx[http2] installed, falling back to requests")
+
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    new_session = requests.Session()
+    new_session.mount("https://", adapter)
+    new_session.mount("http://", adapter)
+    new_session.headers["Accept-Encoding"] = _accept_encoding()
+    return new_session
+
+
+def session() -> Union[requests.Session, Http2Session]:
+    """
+    The process-wide session, created on first use with HTTP_POOL_SIZE connections per host.
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = _create_session(int(os.getenv("HTTP_POOL_SIZE", "32")))
+    return _session
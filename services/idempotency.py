@@ -0,0 +1,192 @@
+"""
+Deduplication of repeated requests and actions.
+
+Results of keyed operations (an Idempotency-Key request, a stop/start of a
+tenant's resources) are kept for a TTL; a repeat of the same key within it
+gets the original result instead of running again, and a repeat arriving
+while the original is still running waits for it. A key reused for a
+different request (see fingerprint) is refused rather than replayed. Results live in memory
+and, with IDEMPOTENCY_DB_PATH, in SQLite so they survive restarts and are
+shared by the workers of one host.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+from services import jsonlib
+from services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyConflictError(Exception):
+    """
+    Raised when an idempotency key is reused for a request other than the one it was first used for.
+    """
+
+
+def fingerprint(payload: Any) -> str:
+    """Stable hash of a JSON-serializable request body, independent of key order."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    TTL store of operation results keyed by idempotency key.
+    """
+
+    def __init__(self, ttl: float, path: Optional[str] = None, namespace: str = "default"):
+        """
+        Initialize the store.
+
+        Args:
+            ttl: Seconds a result is replayed for repeats of its key (0 disables deduplication)
+            path: Optional SQLite file persisting the results (JSON-serializable results only)
+            namespace: Separates the keys of stores sharing one SQLite file
+        """
+        self.ttl = ttl
+        self.namespace = namespace
+        # key -> (stored_at, fingerprint, result), in insertion (and so expiry) order
+        self._entries: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._conn = None
+        if path and ttl > 0:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            with self._lock, self._conn:
+                self._conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS idempotency (
+                        namespace TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        stored_at REAL NOT NULL,
+                        result TEXT NOT NULL,
+                        fingerprint TEXT NOT NULL DEFAULT '',
+                        PRIMARY KEY (namespace, key)
+                    )
+                    """
+                )
+                try:
+                    # Databases created before request fingerprints were stored
+                    self._conn.execute("ALTER TABLE idempotency ADD COLUMN fingerprint TEXT NOT NULL DEFAULT ''")
+                except sqlite3.OperationalError:
+                    pass
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        The stored result of a key and its age in seconds, or None when absent or expired.
+        """
+        entry = self._lookup(key)
+        return None if entry is None else entry[:2]
+
+    def _lookup(self, key: str) -> Optional[Tuple[Any, float, str]]:
+        # (result, age, fingerprint) of a live entry
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT stored_at, fingerprint, result FROM idempotency WHERE namespace = ? AND key = ?",
+                    (self.namespace, key),
+                ).fetchone()
+                if row is not None:
+                    entry = (row[0], row[1], jsonlib.loads(row[2]))
+            if entry is None or now - entry[0] > self.ttl:
+                return None
+            return entry[2], now - entry[0], entry[1]
+
+    def put(self, key: str, result: Any, request_fingerprint: str = "") -> None:
+        now = time.time()
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (now, request_fingerprint, result)
+            while self._entries and now - next(iter(self._entries.values()))[0] > self.ttl:
+                self._entries.popitem(last=False)
+            if self._conn is not None:
+                try:
+                    with self._conn:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO idempotency (namespace, key, stored_at, fingerprint, result) "
+                            "VALUES (?, ?, ?, ?, ?)",
+                            (self.namespace, key, now, request_fingerprint, jsonlib.dumps(result).decode("utf-8")),
+                        )
+                        self._conn.execute(
+                            "DELETE FROM idempotency WHERE namespace = ? AND stored_at < ?",
+                            (self.namespace, now - self.ttl),
+                        )
+                except (sqlite3.Error, TypeError) as e:
+                    logger.error(f"Could not persist idempotency key {key}: {e}")
+
+    def run(self, key: str, fn: Callable[[], Any], request_fingerprint: str = "") -> Tuple[Any, Optional[float]]:
+        """
+        Run fn once per key within the TTL.
+
+        Args:
+            key: Identity of the operation
+            fn: Produces the result; exceptions are raised to every waiting caller and not stored
+            request_fingerprint: Identity of the request using the key (see fingerprint); empty to not check
+
+        Returns:
+            The result and, for repeats, the age of the original result in seconds (None when fn ran)
+
+        Raises:
+            IdempotencyConflictError: If key is already used by a request with another fingerprint
+        """
+        if not self.enabled:
+            return fn(), None
+        stored = self._lookup(key)
+        if stored is None:
+            ran = []
+
+            def execute() -> Tuple[Any, Optional[float], str]:
+                # A repeat arriving after the original finished, but before this call got here, finds it stored
+                stored = self._lookup(key)
+                if stored is not None:
+                    return stored
+                ran.append(True)
+                result = fn()
+                self.put(key, result, request_fingerprint)
+                return result, None, request_fingerprint
+
+            # Requests with different fingerprints never share a flight (the key's owner is checked below)
+            stored = self._flight.do((key, request_fingerprint), execute)
+            if ran:
+                return stored[0], None
+            if stored[1] is None:
+                stored = (stored[0], 0.0, stored[2])
+        result, age, stored_fingerprint = stored
+        if request_fingerprint and stored_fingerprint and stored_fingerprint != request_fingerprint:
+            raise IdempotencyConflictError(f"Idempotency key {key} was already used for a different request")
+        return result, age
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Responses of /api/sendMessage requests carrying an Idempotency-Key header
+request_store = IdempotencyStore(
+    ttl=float(os.getenv("IDEMPOTENCY_TTL", "600")),
+    path=os.getenv("IDEMPOTENCY_DB_PATH") or None,
+    namespace="request",
+)
+
+# Stop/start actions per tenant and target: repeats within the window are not issued again
+action_store = IdempotencyStore(
+    ttl=float(os.getenv("ACTION_DEDUP_WINDOW", "60")),
+    path=os.getenv("IDEMPOTENCY_DB_PATH") or None,
+    namespace="action",
+)
@@ -0,0 +1,319 @@
+"""
+Background inventory sync per tenant.
+
+An InventorySyncer periodically fetches every supported resource type for one
+tenant, diffs the result against its previous snapshot and keeps an indexed
+state table (resource type -> key -> entry) with first-seen / last-changed
+timestamps plus a bounded log of changes. Chat turns read from the table
+instead of re-fetching the full inventory from the Duplo API.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from schemas.resources import ResourceRecord
+from services.resource_store import ResourceStore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ResourceEntry:
+    resource_type: str
+    key: str
+    record: ResourceRecord
+    first_seen: float
+    last_changed: float
+
+
+@dataclass
+class InventoryChange:
+    timestamp: float
+    resource_type: str
+    key: str
+    name: Optional[str]
+    change: str  # added | removed | state_changed | updated
+    old_state: Optional[str] = None
+    new_state: Optional[str] = None
+
+
+class InventorySyncer:
+    """
+    Keeps the inventory of one tenant in memory and refreshes it in a background thread.
+    """
+
+    def __init__(
+        self,
+        resource: Any,
+        resource_types: List[str],
+        interval: float,
+        idle_ttl: float = 0,
+        history_size: int = 1000,
+    ):
+        """
+        Initialize the syncer.
+
+        Args:
+            resource: A Resource bound to the tenant, used to fetch get_<type>_state
+            resource_types: The resource types to keep in sync
+            interval: Seconds between two syncs
+            idle_ttl: Stop syncing after this many seconds without reads (0 = never)
+            history_size: Number of changes retained for changes_since
+        """
+        self.resource = resource
+        self.resource_types = list(resource_types)
+        self.interval = interval
+        self.idle_ttl = idle_ttl
+        self._table: Dict[str, Dict[str, ResourceEntry]] = {t: {} for t in self.resource_types}
+        self._changes: Deque[InventoryChange] = deque(maxlen=history_size)
+        self._synced_at: Dict[str, float] = {}
+        self._version = 0
+        self._snapshot_cache: Tuple[int, Dict[str, List[ResourceRecord]]] = (-1, {})
+        self._store_cache: Tuple[int, Optional[ResourceStore]] = (-1, None)
+        self._lock = threading.RLock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._initialized = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_access = time.monotonic()
+
+    # ----- lifecycle ----------------------------------------------------------
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f"inventory-sync-{self.resource.tenant_id}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+
+    @property
+    def alive(self) -> bool:
+        """False once the syncer was stopped or expired after idle_ttl."""
+        return not self._stopped.is_set()
+
+    def initialize(self) -> None:
+        """Run the blocking initial sync, then keep syncing in the background."""
+        try:
+            self.sync_once()
+        finally:
+            self._initialized.set()
+        self.start()
+
+    def wait_initialized(self, timeout: Optional[float] = None) -> bool:
+        return self._initialized.wait(timeout)
+
+    def request_sync(self) -> None:
+        """Wake the background thread so the next sync happens now (e.g. after stop/start)."""
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            if self.idle_ttl and time.monotonic() - self.last_access > self.idle_ttl:
+                logger.info(f"Inventory sync for tenant {self.resource.tenant_id} idle, stopping")
+                self._stopped.set()
+                break
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.sync_once()
+            except Exception as e:
+                logger.error(f"Inventory sync failed for tenant {self.resource.tenant_id}: {e}")
+
+    # ----- sync and diff ------------------------------------------------------
+    def sync_once(self) -> List[InventoryChange]:
+        """
+        Fetch every resource type once and apply the differences to the state table.
+
+        A type whose fetch fails keeps its previous state rather than being reported as removed.
+
+        Returns:
+            The changes detected by this sync
+        """
+        changes: List[InventoryChange] = []
+        for resource_type in self.resource_types:
+            try:
+                records = getattr(self.resource, f"get_{resource_type}_state")(raise_errors=True)
+            except Exception as e:
+                logger.error(f"Skipping {resource_type} sync for tenant {self.resource.tenant_id}: {e}")
+                continue
+            changes.extend(self._apply(resource_type, records))
+        return changes
+
+    def _apply(self, resource_type: str, records: List[ResourceRecord]) -> List[InventoryChange]:
+        now = time.time()
+        changes: List[InventoryChange] = []
+        with self._lock:
+            table = self._table[resource_type]
+            baseline = resource_type not in self._synced_at
+            mutated = False
+            seen = set()
+            for record in records:
+                # EC2 instance_id, RDS Identifier, ASG FriendlyName
+                key = record.key
+                if key is None:
+                    continue
+                seen.add(key)
+                entry = table.get(key)
+                if entry is None:
+                    table[key] = ResourceEntry(resource_type, key, record, now, now)
+                    mutated = True
+                    # The initial load is the baseline, not a change
+                    if not baseline:
+                        changes.append(InventoryChange(
+                            now, resource_type, key, record.name, "added",
+                            new_state=record.state,
+                        ))
+                elif entry.record != record:
+                    old_state, new_state = entry.record.state, record.state
+                    kind = "state_changed" if old_state != new_state else "updated"
+                    changes.append(InventoryChange(
+                        now, resource_type, key, record.name, kind,
+                        old_state=old_state, new_state=new_state,
+                    ))
+                    entry.record = record
+                    entry.last_changed = now
+
+            for key in [k for k in table if k not in seen]:
+                entry = table.pop(key)
+                changes.append(InventoryChange(
+                    now, resource_type, key, entry.record.name, "removed",
+                    old_state=entry.record.state,
+                ))
+
+            self._synced_at[resource_type] = now
+            self._changes.extend(changes)
+            if changes or mutated:
+                self._version += 1
+        return changes
+
+    # ----- reads --------------------------------------------------------------
+    @property
+    def ready(self) -> bool:
+        """True once every resource type has been synced at least once."""
+        return len(self._synced_at) == len(self.resource_types)
+
+    def snapshot(self) -> Dict[str, List[ResourceRecord]]:
+        """
+        Current inventory in the same shape as Resource.get_running_resources.
+
+        The snapshot is rebuilt only when the table changed since the last read.
+        """
+        self.last_access = time.monotonic()
+        with self._lock:
+            version, cached = self._snapshot_cache
+            if version != self._version:
+                cached = {
+                    resource_type: [entry.record for entry in table.values()]
+                    for resource_type, table in self._table.items()
+                }
+                self._snapshot_cache = (self._version, cached)
+            return cached
+
+    def store(self) -> ResourceStore:
+        """
+        Indexed view of the current snapshot, rebuilt only when the table changed.
+        """
+        snapshot = self.snapshot()
+        with self._lock:
+            version, store = self._store_cache
+            if version != self._version or store is None:
+                store = ResourceStore(snapshot)
+                self._store_cache = (self._version, store)
+            return store
+
+    def get(self, resource_type: str, key: str) -> Optional[ResourceEntry]:
+        """O(1) lookup of one resource by type and key."""
+        self.last_access = time.monotonic()
+        with self._lock:
+            return self._table.get(resource_type, {}).get(key)
+
+    def changes_since(self, since: float = 0.0) -> List[InventoryChange]:
+        """Changes recorded after the given epoch timestamp (oldest first)."""
+        self.last_access = time.monotonic()
+        with self._lock:
+            return [change for change in self._changes if change.timestamp > since]
+
+    def last_synced(self) -> Optional[float]:
+        """Epoch timestamp of the oldest per-type sync, None before the first complete sync."""
+        with self._lock:
+            if not self.ready:
+                return None
+            return min(self._synced_at.values())
+
+
+class InventorySyncManager:
+    """
+    Registry of syncers keyed by (host_url, tenant_id).
+    """
+
+    def __init__(self, interval: float, idle_ttl: float = 0):
+        self.interval = interval
+        self.idle_ttl = idle_ttl
+        self._syncers: Dict[Tuple[str, str], InventorySyncer] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def get(self, host_url: str, tenant_id: str) -> Optional[InventorySyncer]:
+        """The running syncer for a tenant, if any."""
+        with self._lock:
+            syncer = self._syncers.get((host_url, tenant_id))
+        return syncer if syncer and syncer.alive else None
+
+    def get_or_create(
+        self,
+        host_url: str,
+        tenant_id: str,
+        resource_factory: Callable[[], Any],
+        resource_types: List[str],
+    ) -> InventorySyncer:
+        """
+        Return the tenant's syncer, starting one (with a blocking initial sync) if needed.
+
+        Args:
+            host_url: Duplo base URL of the tenant
+            tenant_id: Tenant ID
+            resource_factory: Builds the Resource the syncer fetches with
+            resource_types: Resource types to keep in sync
+        """
+        key = (host_url, tenant_id)
+        with self._lock:
+            syncer = self._syncers.get(key)
+            if syncer is None or not syncer.alive:
+                syncer = InventorySyncer(resource_factory(), resource_types, self.interval, self.idle_ttl)
+                self._syncers[key] = syncer
+                created = True
+            else:
+                created = False
+        if created:
+            syncer.initialize()
+        else:
+            # Another request is running the initial sync, share its result
+            syncer.wait_initialized(timeout=self.interval)
+        return syncer
+
+    def stop_all(self) -> None:
+        with self._lock:
+            syncers, self._syncers = list(self._syncers.values()), {}
+        for syncer in syncers:
+            syncer.stop()
+
+
+# Process-wide manager, disabled unless INVENTORY_SYNC_INTERVAL is set
+default_manager = InventorySyncManager(
+    interval=float(os.getenv("INVENTORY_SYNC_INTERVAL", "0")),
+    idle_ttl=float(os.getenv("INVENTORY_SYNC_IDLE_TTL", "3600")),
+)
@@ -0,0 +1,131 @@
+"""
+In-process job queue for long-running actions (bulk stop/start).
+
+The chat turn enqueues the action and returns the job id immediately; a
+bounded worker pool executes it and the job's progress can be polled via
+GET /api/jobs/{job_id}. Finished jobs are kept for JOB_RETENTION seconds.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+@dataclass
+class Job:
+    job_id: str
+    kind: str
+    tenant_id: Optional[str]
+    status: str = QUEUED
+    completed: int = 0
+    total: Optional[int] = None
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def update_progress(self, completed: int, total: int) -> None:
+        """Progress callback handed to the action (completed out of total items)."""
+        self.completed = completed
+        self.total = total
+
+    @property
+    def done(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "tenant_id": self.tenant_id,
+            "status": self.status,
+            "progress": {"completed": self.completed, "total": self.total},
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """
+    Executes submitted jobs on a bounded thread pool and keeps their status.
+    """
+
+    def __init__(self, max_workers: int = 4, retention: float = 3600):
+        """
+        Initialize the queue.
+
+        Args:
+            max_workers: Maximum number of jobs executing at once
+            retention: Seconds a finished job stays available for polling
+        """
+        self.retention = retention
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="jobs")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, tenant_id: Optional[str], action: Callable[[Job], Any]) -> Job:
+        """
+        Enqueue an action.
+
+        Args:
+            kind: Short description of the job (e.g. "stop")
+            tenant_id: Tenant the job acts on
+            action: Called with the Job (for progress updates); its return value becomes the result
+
+        Returns:
+            The queued job
+        """
+        job = Job(job_id=uuid.uuid4().hex, kind=kind, tenant_id=tenant_id)
+        with self._lock:
+            self._evict_expired()
+            self._jobs[job.job_id] = job
+        self._pool.submit(self._execute, job, action)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _execute(self, job: Job, action: Callable[[Job], Any]) -> None:
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = action(job)
+            job.status = SUCCEEDED
+        except Exception as e:
+            logger.error(f"Job {job.job_id} ({job.kind}) failed: {e}")
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+
+    def _evict_expired(self) -> None:
+        cutoff = time.time() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Process-wide queue shared by the agents and the /api/jobs endpoint
+default_queue = JobQueue(
+    max_workers=int(os.getenv("JOB_WORKERS", "4")),
+    retention=float(os.getenv("JOB_RETENTION", "3600")),
+)
@@ -0,0 +1,142 @@
+"""
+Pluggable JSON backend shared by the LLM client and the chat server.
+
+orjson is used when it is installed, otherwise the stdlib json module. Set
+JSON_BACKEND=stdlib to force the fallback (e.g. when comparing outputs).
+Both backends encode to and decode from bytes so callers never need an
+intermediate str.
+
+iter_projected_items parses a top-level JSON array incrementally (with ijson
+when installed) and keeps only the requested fields of each element.
+"""
+import json
+import logging
+import os
+from dataclasses import fields, is_dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import IO, Any, Dict, Iterable, Iterator, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover - depends on the environment
+    ijson = None
+
+logger = logging.getLogger(__name__)
+
+
+def _select_backend() -> str:
+    requested = os.getenv("JSON_BACKEND", "orjson").lower()
+    if requested == "orjson" and orjson is None:
+        logger.info("orjson is not installed, falling back to stdlib json")
+        return "stdlib"
+    if requested not in ("orjson", "stdlib"):
+        raise ValueError(f"Unsupported JSON_BACKEND: {requested}")
+    return requested
+
+
+BACKEND = _select_backend()
+
+
+def _stdlib_default(obj: Any) -> Any:
+    # Mirror what orjson serializes natively
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return {f.name: getattr(obj, f.name) for f in fields(obj)}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """
+    Serialize obj to UTF-8 encoded JSON bytes.
+
+    Args:
+        obj: The object to serialize
+        indent: Pretty-print with two space indentation (for logs)
+
+    Returns:
+        The JSON document as bytes
+    """
+    if BACKEND == "orjson":
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+
+    return json.dumps(
+        obj,
+        default=_stdlib_default,
+        ensure_ascii=False,
+        indent=2 if indent else None,
+        separators=None if indent else (",", ":"),
+    ).encode("utf-8")
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """
+    Deserialize a JSON document, accepting bytes directly.
+
+    Args:
+        data: The JSON document as bytes or str
+
+    Returns:
+        The decoded Python object
+    """
+    if BACKEND == "orjson":
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+_SCALAR_EVENTS = frozenset(("string", "number", "boolean", "null"))
+
+
+def project(items: Iterable[Dict[str, Any]], fields: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Keep only the given top-level fields of each item."""
+    fields = tuple(fields)
+    for item in items:
+        yield {field: item[field] for field in fields if field in item}
+
+
+def iter_projected_items(stream: IO[bytes], fields: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Incrementally parse a top-level JSON array, yielding each element reduced to fields.
+
+    Only scalar values of the requested fields are kept; every other value
+    (including nested objects) is skipped by the parser without being built,
+    so memory stays proportional to one element rather than the whole payload.
+    Without ijson the stream is read and decoded at once, then projected.
+
+    Args:
+        stream: A binary file-like object positioned at the start of the document
+        fields: The top-level fields to keep
+
+    Returns:
+        An iterator of projected dicts, in payload order
+    """
+    if ijson is None:
+        payload = loads(stream.read())
+        yield from project(payload if isinstance(payload, list) else [], fields)
+        return
+
+    wanted = {f"item.{field}": field for field in fields}
+    current: Dict[str, Any] = {}
+    # Without use_float, which some ijson backends apply to integers too: ints stay ints
+    # and only non-integral numbers (Decimal) become floats, as with loads
+    for prefix, event, value in ijson.parse(stream):
+        if prefix == "item":
+            if event == "start_map":
+                current = {}
+            elif event == "end_map":
+                yield current
+        elif event in _SCALAR_EVENTS:
+            field = wanted.get(prefix)
+            if field is not None:
+                current[field] = float(value) if isinstance(value, Decimal) else value
@@ -0,0 +1,41 @@
+"""
+Deferred module imports.
+
+lazy_import returns a module whose code only runs on first attribute access,
+so heavy dependencies (numpy, boto3, ...) are not paid for at server startup
+by code paths that never use them.
+"""
+import importlib
+import importlib.util
+import sys
+from types import ModuleType
+
+
+class _LazyModule(ModuleType):
+    """
+    Stands in for a module until an attribute is first read, then imports it.
+
+    The import goes through the regular import system (and its per-module locks),
+    so threads reaching a module at the same time all see it fully initialised;
+    importlib.util.LazyLoader gives no such guarantee before Python 3.12.
+    """
+
+    def __getattr__(self, attr: str):
+        module = importlib.import_module(self.__name__)
+        return getattr(module, attr)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Import a module lazily (an already imported module is returned as-is).
+
+    Raises:
+        ModuleNotFoundError: If the module cannot be found; missing dependencies of
+            the module itself only surface when it is first used
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    return _LazyModule(name)
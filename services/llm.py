@@ -1,10 +1,10 @@
-import json
-import boto3
+import threading
 import time
 import logging
 from typing import Dict, Any, Optional
 import os
 import dotenv
+from services import jsonlib
 
 dotenv.load_dotenv()
 
@@ -19,7 +19,7 @@ logging.basicConfig(
 class BedrockAnthropicLLM:
     """
     A class for interacting with AWS Bedrock LLMs.
-    Initializes the Bedrock client once and reuses it across multiple invocations.
+    Creates the Bedrock client on first use and reuses it across multiple invocations.
     """
     
     def __init__(self, region_name: str = 'us-east-1'):
@@ -29,19 +29,38 @@ class BedrockAnthropicLLM:
         Args:
             region_name: AWS region name (optional, uses 'us-east-1' by default)
         """
+        self.region_name = region_name
+        self._bedrock_runtime = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def bedrock_runtime(self):
+        """
+        The Bedrock runtime client, built on first use so boto3 is not loaded at startup.
+        """
+        if self._bedrock_runtime is None:
+            with self._client_lock:
+                if self._bedrock_runtime is None:
+                    import boto3
+                    from botocore.config import Config
+
+                    # One client (and connection pool) is shared by every agent in the process
+                    config = Config(max_pool_connections=int(os.getenv("BEDROCK_MAX_POOL_CONNECTIONS", "50")))
+                    app_env = os.getenv("APP_ENV", "duplo")
+                    logger.info(f"Initializing Bedrock client for APP_ENV: {app_env}")
+                    if app_env == "local":
+                        self._bedrock_runtime = boto3.client(
+                            'bedrock-runtime', 
+                            region_name=self.region_name,
+                            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                            aws_session_token=os.getenv("AWS_SESSION_TOKEN"),
+                            config=config,
+                            )
+                    else:
+                        self._bedrock_runtime = boto3.client('bedrock-runtime', region_name=self.region_name, config=config)
+        return self._bedrock_runtime
 
-        app_env = os.getenv("APP_ENV", "duplo")
-        logger.info(f"Initializing Bedrock client for APP_ENV: {app_env}")
-        if app_env == "local":
-            self.bedrock_runtime = boto3.client(
-                'bedrock-runtime', 
-                region_name=region_name,
-                aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-                aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-                aws_session_token=os.getenv("AWS_SESSION_TOKEN"),
-                )
-        else:
-            self.bedrock_runtime = boto3.client('bedrock-runtime', region_name=region_name)
     def invoke(
         self,
         messages: list,
@@ -74,7 +93,35 @@ class BedrockAnthropicLLM:
         Returns:
             The text response from the LLM
         """
+        response_body = self.invoke_raw(
+            messages, model_id, max_tokens, temperature, top_p, top_k, stop_sequences, latency,
+            system_prompt, tools, additional_params, tool_choice
+        )
+        return self._extract_response(response_body, model_id, tool_choice)
 
+    def invoke_raw(
+        self,
+        messages: list,
+        model_id: str,
+        max_tokens: int = 1000,
+        temperature: float = 0.0,
+        top_p: float = 0.9,
+        top_k: Optional[int] = None,
+        stop_sequences: Optional[list] = None,
+        latency: str = "standard",
+        system_prompt: Optional[str] = None,
+        tools: Optional[list] = None,
+        additional_params: Optional[Dict[str, Any]] = None,
+        tool_choice: Optional[dict] = None
+    ) -> Dict[str, Any]:
+        """
+        Invoke the model like invoke, but return the whole response body.
+
+        Used for tool loops, which need every content block (text and tool_use) and the stop_reason.
+
+        Returns:
+            The decoded response body ({"content": [...], "stop_reason": ..., ...})
+        """
         if "anthropic" not in model_id.lower():
             raise ValueError(f"Unsupported model: {model_id}. Currently only Anthropic/Claude models are supported.")
 
@@ -99,7 +146,7 @@ class BedrockAnthropicLLM:
         #TODO: Update to use the converse bedrock API, so it's easier to switch models.
         response = self.bedrock_runtime.invoke_model(
             modelId=model_id,
-            body=json.dumps(request_body),
+            body=jsonlib.dumps(request_body),
             contentType="application/json",
             accept="application/json",
             performanceConfigLatency=latency,
@@ -108,11 +155,11 @@ class BedrockAnthropicLLM:
         elapsed = time.perf_counter() - start_time
         logger.info("Model %s call completed in %.2f seconds", model_id, elapsed)
         
-        # Parse and return the response
-        response_body = json.loads(response['body'].read().decode('utf-8'))
+        # Parse and return the response (decoded straight from the body bytes)
+        response_body = jsonlib.loads(response['body'].read())
 
         logger.info("LLM Response body: %s", response_body)
-        return self._extract_response(response_body, model_id, tool_choice)
+        return response_body
     
     def _prepare_request_body(
         self,
@@ -0,0 +1,164 @@
+"""
+Local pricing catalog and cost estimation.
+
+Hourly on-demand prices per EC2 instance type and RDS instance class (plus
+RDS storage per GB-month) are read once from a bundled JSON file into a
+numpy price array indexed by (family, type name). Estimating an inventory
+is one index lookup per record followed by array arithmetic, which keeps
+ordering thousands of resources by cost well under a millisecond.
+"""
+import logging
+import os
+from itertools import repeat
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from schemas.resources import ResourceRecord
+from services import jsonlib
+
+logger = logging.getLogger(__name__)
+
+HOURS_PER_MONTH = 730.0
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(__file__), "data", "pricing.json")
+
+
+def descending(costs: np.ndarray) -> np.ndarray:
+    """
+    Positions of costs from highest to lowest, unknown (NaN) costs last.
+    """
+    return np.argsort(-np.nan_to_num(costs, nan=-1.0), kind="stable")
+
+
+class PricingCatalog:
+    """
+    Hourly prices by (family, type name), where family is "ec2" or "rds".
+    """
+
+    def __init__(self, prices: Dict[str, Dict[str, float]], rds_storage_gb_month: float = 0.0,
+                 currency: str = "USD"):
+        """
+        Initialize the catalog.
+
+        Args:
+            prices: family -> type name (e.g. "t3.medium", "db.t3.large") -> hourly price
+            rds_storage_gb_month: RDS storage price per GB-month
+            currency: Currency of every price
+        """
+        self.currency = currency
+        self.storage_hourly_per_gb = rds_storage_gb_month / HOURS_PER_MONTH
+        self._index: Dict[str, Dict[str, int]] = {}
+        values: List[float] = []
+        for family, table in prices.items():
+            positions = self._index.setdefault(family, {})
+            for name, price in table.items():
+                positions[name.lower()] = len(values)
+                values.append(float(price))
+        # Types missing from the catalog point at the trailing NaN
+        self._missing = len(values)
+        self._prices = np.array(values + [np.nan], dtype=np.float64)
+
+    @classmethod
+    def load(cls, path: str) -> "PricingCatalog":
+        with open(path, "rb") as f:
+            raw = jsonlib.loads(f.read())
+        return cls(
+            {"ec2": raw.get("ec2", {}), "rds": raw.get("rds", {})},
+            rds_storage_gb_month=raw.get("rds_storage_gb_month", 0.0),
+            currency=raw.get("currency", "USD"),
+        )
+
+    def __len__(self) -> int:
+        return self._missing
+
+    def _lookup(self, family: str, names: Iterable[Optional[str]], count: int) -> np.ndarray:
+        index = self._index.get(family, {})
+        positions = np.fromiter(map(index.get, names, repeat(self._missing)), dtype=np.intp, count=count)
+        return self._prices[positions]
+
+    def hourly_costs(self, resource_type: str, records: List[ResourceRecord],
+                     include_storage: bool = True) -> np.ndarray:
+        """
+        Estimated hourly cost of each record while running (NaN when its type is not in the catalog).
+
+        Args:
+            resource_type: ec2, rds or asg
+            records: Records of that type
+            include_storage: Add RDS storage, which is billed even while the instance is stopped
+
+        Returns:
+            Costs aligned with records
+        """
+        count = len(records)
+        if resource_type == "ec2":
+            return self._lookup("ec2", [r.instance_type for r in records], count)
+        if resource_type == "asg":
+            # A stopped ASG is priced at the single instance it is scaled back out to
+            capacity = np.array([r.desired_capacity or 0 for r in records], dtype=np.float64)
+            return self._lookup("ec2", [r.instance_type for r in records], count) * np.maximum(capacity, 1)
+        if resource_type == "rds":
+            costs = self._lookup("rds", [r.instance_class for r in records], count)
+            if include_storage:
+                storage = np.array([r.size or 0 for r in records], dtype=np.float64)
+                costs = costs + storage * self.storage_hourly_per_gb
+            return costs
+        return np.full(count, np.nan)
+
+    def estimate(self, resources: Dict[str, List[ResourceRecord]],
+                 include_storage: bool = True) -> Dict[str, np.ndarray]:
+        """
+        Hourly costs per resource type, aligned with the records of each type.
+        """
+        return {
+            resource_type: self.hourly_costs(resource_type, records, include_storage=include_storage)
+            for resource_type, records in resources.items()
+        }
+
+    def savings(self, resources: Dict[str, List[ResourceRecord]]) -> Dict[str, np.ndarray]:
+        """
+        Hourly amount saved by stopping each resource (RDS storage keeps being billed).
+        """
+        return self.estimate(resources, include_storage=False)
+
+    def rank_by_savings(self, resources: Dict[str, List[ResourceRecord]],
+                        limit: Optional[int] = None) -> Dict[str, List[ResourceRecord]]:
+        """
+        Order resources by hourly savings, highest first, optionally keeping only the top limit
+        across all types. Resources with an unknown price come last.
+
+        Returns:
+            The selected resources grouped by type, most expensive first within each type
+        """
+        types = [resource_type for resource_type, records in resources.items() if records]
+        if not types:
+            return {resource_type: [] for resource_type in resources}
+        savings = self.savings({resource_type: resources[resource_type] for resource_type in types})
+        costs = np.concatenate([savings[resource_type] for resource_type in types])
+        type_ids = np.concatenate([np.full(len(savings[t]), i, dtype=np.intp) for i, t in enumerate(types)])
+        offsets = np.concatenate([np.arange(len(savings[t]), dtype=np.intp) for t in types])
+
+        order = descending(costs)
+        if limit is not None:
+            order = order[:limit]
+
+        ranked: Dict[str, List[ResourceRecord]] = {resource_type: [] for resource_type in resources}
+        for type_id, offset in zip(type_ids[order].tolist(), offsets[order].tolist()):
+            resource_type = types[type_id]
+            ranked[resource_type].append(resources[resource_type][offset])
+        return ranked
+
+
+def _load_default() -> PricingCatalog:
+    path = os.getenv("PRICING_CATALOG_PATH", DEFAULT_CATALOG_PATH)
+    try:
+        catalog = PricingCatalog.load(path)
+        logger.info(f"Loaded {len(catalog)} prices from {path}")
+        return catalog
+    except Exception as e:
+        logger.error(f"Could not load pricing catalog {path}: {e}")
+        return PricingCatalog({})
+
+
+# Process-wide catalog, PRICING_CATALOG_PATH overrides the bundled prices
+default_catalog = _load_default()
@@ -0,0 +1,142 @@
+"""
+Indexed, read-only view over a resource snapshot ({resource_type: [records]}).
+
+Built once per snapshot so per-resource actions ("stop i-123", "stop all
+dev-* hosts") are index lookups instead of scans over freshly fetched lists.
+Names and states are matched case-insensitively.
+"""
+from bisect import bisect_left
+from fnmatch import fnmatchcase
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from schemas.resources import ResourceRecord
+
+WILDCARDS = "*?["
+
+# (resource_type, record)
+Item = Tuple[str, ResourceRecord]
+
+
+class ResourceStore:
+    """
+    Indexes resources by type, (type, state), name, instance_id and name prefix.
+    """
+
+    def __init__(self, snapshot: Dict[str, List[ResourceRecord]]):
+        """
+        Build the indexes.
+
+        Args:
+            snapshot: Resources grouped by type, as returned by Resource.get_running_resources
+        """
+        self._by_type: Dict[str, List[ResourceRecord]] = {}
+        self._by_state: Dict[Tuple[str, str], List[ResourceRecord]] = {}
+        self._by_name: Dict[str, List[Item]] = {}
+        self._by_instance_id: Dict[str, Item] = {}
+        names = set()
+
+        for resource_type, records in snapshot.items():
+            self._by_type[resource_type] = list(records)
+            for record in records:
+                item = (resource_type, record)
+                # States are already lower-cased and interned by the record types
+                self._by_state.setdefault((resource_type, record.state or ""), []).append(record)
+                name = record.name
+                if name:
+                    self._by_name.setdefault(name.lower(), []).append(item)
+                    names.add(name.lower())
+                instance_id = getattr(record, "instance_id", None)
+                if instance_id:
+                    self._by_instance_id[instance_id.lower()] = item
+
+        # Sorted once so prefix queries are a bisect plus the matching range
+        self._sorted_names = sorted(names)
+
+    def __len__(self) -> int:
+        return sum(len(records) for records in self._by_type.values())
+
+    def by_type(self, resource_type: str) -> List[ResourceRecord]:
+        return self._by_type.get(resource_type, [])
+
+    def by_state(self, resource_type: str, state: str) -> List[ResourceRecord]:
+        return self._by_state.get((resource_type, state.lower()), [])
+
+    def get(self, identifier: str) -> List[Item]:
+        """
+        Exact lookup by instance_id, falling back to name (names may repeat across types).
+        """
+        key = identifier.lower()
+        item = self._by_instance_id.get(key)
+        if item:
+            return [item]
+        return list(self._by_name.get(key, []))
+
+    def with_prefix(self, prefix: str) -> List[Item]:
+        """All resources whose name starts with prefix."""
+        prefix = prefix.lower()
+        items: List[Item] = []
+        index = bisect_left(self._sorted_names, prefix)
+        while index < len(self._sorted_names) and self._sorted_names[index].startswith(prefix):
+            items.extend(self._by_name[self._sorted_names[index]])
+            index += 1
+        return items
+
+    def match(self, pattern: str) -> List[Item]:
+        """
+        Resolve a name, instance id or glob pattern such as "dev-*".
+
+        Patterns are narrowed with the prefix index (the part before the first
+        wildcard) before the glob is applied.
+        """
+        positions = [pattern.find(c) for c in WILDCARDS if c in pattern]
+        if not positions:
+            return self.get(pattern)
+        pattern = pattern.lower()
+        prefix = pattern[:min(positions)]
+        candidates: Iterable[Item] = self.with_prefix(prefix) if prefix else self._all_items()
+        return [
+            item for item in candidates
+            if fnmatchcase((item[1].name or "").lower(), pattern)
+            or fnmatchcase((getattr(item[1], "instance_id", None) or "").lower(), pattern)
+        ]
+
+    def _all_items(self) -> Iterable[Item]:
+        for resource_type, records in self._by_type.items():
+            for record in records:
+                yield resource_type, record
+
+    def select(
+        self,
+        resource_type: Optional[str] = None,
+        states: Optional[Dict[str, str]] = None,
+        name: Optional[str] = None,
+    ) -> Dict[str, List[ResourceRecord]]:
+        """
+        Select resources, grouped by type.
+
+        Args:
+            resource_type: Only this resource type
+            states: Required state per resource type (types missing from the mapping are excluded)
+            name: Name, instance id or glob pattern
+
+        Returns:
+            The matching resources grouped by type
+        """
+        types = [resource_type] if resource_type else list(self._by_type)
+        if states is not None:
+            types = [t for t in types if t in states]
+
+        if name is None:
+            return {
+                t: self.by_state(t, states[t]) if states is not None else self.by_type(t)
+                for t in types
+            }
+
+        selected: Dict[str, List[ResourceRecord]] = {t: [] for t in types}
+        for item_type, record in self.match(name):
+            if item_type not in selected:
+                continue
+            if states is not None and record.state != states[item_type].lower():
+                continue
+            selected[item_type].append(record)
+        return selected
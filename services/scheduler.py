@@ -0,0 +1,327 @@
+"""
+Scheduled auto-optimisation (off-hours stop/start).
+
+Rules are cron-like ("0 20 * * 1-5" = 20:00 on weekdays) and scoped to a
+tenant, optionally a resource type and a name pattern. A single scheduler
+thread finds the rules due each minute, batches them per tenant and hands
+each tenant batch to a bounded worker pool, so a slow tenant only ever
+occupies one worker and never delays the others. Every run is recorded in
+a local SQLite history.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from services import jsonlib
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = ("stop", "start")
+
+# (minimum, maximum) per cron field: minute hour day-of-month month day-of-week
+_CRON_BOUNDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def _parse_cron_field(spec: str, minimum: int, maximum: int) -> FrozenSet[int]:
+    values: Set[int] = set()
+    for part in spec.split(","):
+        part, _, step_spec = part.partition("/")
+        step = int(step_spec) if step_spec else 1
+        if step < 1:
+            raise ValueError(f"Invalid cron step: {spec}")
+        if part == "*":
+            start, end = minimum, maximum
+        elif "-" in part:
+            start, end = (int(v) for v in part.split("-", 1))
+        else:
+            start = int(part)
+            end = maximum if step_spec else start
+        if start < minimum or end > maximum or start > end:
+            raise ValueError(f"Cron field out of range: {spec}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+@dataclass(frozen=True)
+class CronExpression:
+    """
+    Five field cron expression: minute hour day-of-month month day-of-week (0 or 7 = Sunday).
+    """
+    minutes: FrozenSet[int]
+    hours: FrozenSet[int]
+    days: FrozenSet[int]
+    months: FrozenSet[int]
+    weekdays: FrozenSet[int]
+    any_day: bool
+    any_weekday: bool
+
+    @classmethod
+    def parse(cls, expression: str) -> "CronExpression":
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        minutes, hours, days, months, weekdays = (
+            _parse_cron_field(spec, *bounds) for spec, bounds in zip(parts, _CRON_BOUNDS)
+        )
+        # Sunday may be written as 0 or 7
+        weekdays = frozenset(d % 7 for d in weekdays)
+        return cls(minutes, hours, days, months, weekdays, parts[2] == "*", parts[4] == "*")
+
+    def matches(self, moment: datetime) -> bool:
+        if moment.minute not in self.minutes or moment.hour not in self.hours or moment.month not in self.months:
+            return False
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.isoweekday() % 7) in self.weekdays
+        # Standard cron: when both day fields are restricted, either may match
+        if self.any_day:
+            return weekday_ok
+        if self.any_weekday:
+            return day_ok
+        return day_ok or weekday_ok
+
+
+@dataclass
+class ScheduleRule:
+    rule_id: str
+    cron: str
+    action: str
+    host_url: str
+    tenant_id: str
+    tenant_name: str = ""
+    resource_type: Optional[str] = None
+    name_pattern: Optional[str] = None
+    timezone: str = "UTC"
+    expression: CronExpression = field(init=False, repr=False)
+
+    def __post_init__(self):
+        if self.action not in ACTIONS:
+            raise ValueError(f"Unsupported scheduled action {self.action!r} in rule {self.rule_id}")
+        self.expression = CronExpression.parse(self.cron)
+        self._tz = _load_timezone(self.timezone)
+
+    @property
+    def tenant_key(self) -> Tuple[str, str]:
+        return self.host_url, self.tenant_id
+
+    def is_due(self, minute_utc: datetime) -> bool:
+        return self.expression.matches(minute_utc.astimezone(self._tz))
+
+
+def _load_timezone(name: str):
+    if name.upper() == "UTC":
+        return timezone.utc
+    from zoneinfo import ZoneInfo
+    return ZoneInfo(name)
+
+
+def load_rules(path: str) -> List[ScheduleRule]:
+    """
+    Load rules from a JSON file containing a list of rule objects.
+
+    Example:
+        [{"rule_id": "dev-nightly-stop", "cron": "0 20 * * 1-5", "action": "stop",
+          "host_url": "https://example.duplocloud.net", "tenant_id": "...",
+          "tenant_name": "dev", "resource_type": "ec2", "name_pattern": "dev-*"}]
+    """
+    with open(path, "rb") as f:
+        raw_rules = jsonlib.loads(f.read())
+    return [ScheduleRule(**raw) for raw in raw_rules]
+
+
+class RunHistory:
+    """
+    SQLite log of scheduled runs.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schedule_runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    rule_id TEXT NOT NULL,
+                    tenant_id TEXT NOT NULL,
+                    action TEXT NOT NULL,
+                    scheduled_for TEXT NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    status TEXT NOT NULL,
+                    resources TEXT,
+                    error TEXT
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS schedule_runs_rule ON schedule_runs (rule_id, scheduled_for)"
+            )
+
+    def start(self, rule: ScheduleRule, scheduled_for: datetime) -> int:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO schedule_runs (rule_id, tenant_id, action, scheduled_for, started_at, status) "
+                "VALUES (?, ?, ?, ?, ?, 'running')",
+                (rule.rule_id, rule.tenant_id, rule.action, scheduled_for.isoformat(), time.time()),
+            )
+            return cursor.lastrowid
+
+    def finish(self, run_id: int, status: str, resources: Optional[List[str]] = None,
+               error: Optional[str] = None) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE schedule_runs SET finished_at = ?, status = ?, resources = ?, error = ? WHERE id = ?",
+                (
+                    time.time(),
+                    status,
+                    jsonlib.dumps(resources).decode("utf-8") if resources is not None else None,
+                    error,
+                    run_id,
+                ),
+            )
+
+    def skipped(self, rule: ScheduleRule, scheduled_for: datetime, reason: str) -> None:
+        run_id = self.start(rule, scheduled_for)
+        self.finish(run_id, "skipped", error=reason)
+
+    def recent(self, limit: int = 100) -> List[Dict[str, Any]]:
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT id, rule_id, tenant_id, action, scheduled_for, started_at, finished_at, status, "
+                "resources, error FROM schedule_runs ORDER BY id DESC LIMIT ?",
+                (limit,),
+            )
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class Scheduler:
+    """
+    Runs due rules with bounded concurrency, one batch per tenant at a time.
+    """
+
+    def __init__(
+        self,
+        rules: List[ScheduleRule],
+        run_action: Callable[[ScheduleRule], Dict[str, List[Any]]],
+        history: RunHistory,
+        max_workers: int = 8,
+        tick: float = 15.0,
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            rules: The schedule rules
+            run_action: Executes one rule, returning the resources acted on grouped by type
+            history: Where runs are recorded
+            max_workers: Maximum number of tenant batches executing at once
+            tick: Seconds between two checks for due rules
+        """
+        self.rules = rules
+        self.run_action = run_action
+        self.history = history
+        self.tick = tick
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scheduler")
+        self._in_flight: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_minute = self._current_minute()
+
+    @staticmethod
+    def _current_minute() -> datetime:
+        return datetime.now(timezone.utc).replace(second=0, microsecond=0)
+
+    def start(self) -> None:
+        logger.info(f"Starting scheduler with {len(self.rules)} rules")
+        self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.tick):
+            try:
+                self.run_pending(self._current_minute())
+            except Exception as e:
+                logger.error(f"Scheduler tick failed: {e}")
+
+    def run_pending(self, now_minute: datetime) -> int:
+        """
+        Dispatch the rules due in every minute since the previous check, up to now_minute.
+
+        Returns:
+            The number of tenant batches dispatched
+        """
+        # Catch up on missed minutes (e.g. a long GC pause), but never more than an hour
+        first = max(self._last_minute + timedelta(minutes=1), now_minute - timedelta(minutes=59))
+        batches: Dict[Tuple[Tuple[str, str], datetime], List[ScheduleRule]] = {}
+        minute = first
+        while minute <= now_minute:
+            for rule in self.rules:
+                if rule.is_due(minute):
+                    batches.setdefault((rule.tenant_key, minute), []).append(rule)
+            minute += timedelta(minutes=1)
+        self._last_minute = max(self._last_minute, now_minute)
+
+        for (tenant_key, scheduled_for), rules in batches.items():
+            with self._lock:
+                busy = tenant_key in self._in_flight
+                if not busy:
+                    self._in_flight.add(tenant_key)
+            if busy:
+                # Never overlap two batches on one tenant
+                for rule in rules:
+                    self.history.skipped(rule, scheduled_for, "previous run for this tenant still in progress")
+                continue
+            self._pool.submit(self._run_batch, tenant_key, scheduled_for, rules)
+        return len(batches)
+
+    def _run_batch(self, tenant_key: Tuple[str, str], scheduled_for: datetime, rules: List[ScheduleRule]) -> None:
+        try:
+            for rule in rules:
+                run_id = self.history.start(rule, scheduled_for)
+                try:
+                    acted_on = self.run_action(rule)
+                    names = [
+                        f"{resource_type}:{record.key}"
+                        for resource_type, records in acted_on.items()
+                        for record in records
+                    ]
+                    self.history.finish(run_id, "succeeded", resources=names)
+                    logger.info(f"Scheduled {rule.action} {rule.rule_id} on tenant {rule.tenant_id}: {len(names)} resources")
+                except Exception as e:
+                    logger.error(f"Scheduled {rule.action} {rule.rule_id} failed on tenant {rule.tenant_id}: {e}")
+                    self.history.finish(run_id, "failed", error=str(e))
+        finally:
+            with self._lock:
+                self._in_flight.discard(tenant_key)
+
+
+def scheduler_from_env(run_action: Callable[[ScheduleRule], Dict[str, List[Any]]]) -> Optional[Scheduler]:
+    """
+    Build a scheduler from SCHEDULE_RULES_PATH (None when it is not set).
+    """
+    rules_path = os.getenv("SCHEDULE_RULES_PATH")
+    if not rules_path:
+        return None
+    return Scheduler(
+        load_rules(rules_path),
+        run_action,
+        RunHistory(os.getenv("SCHEDULE_DB_PATH", "schedule_runs.db")),
+        max_workers=int(os.getenv("SCHEDULER_MAX_WORKERS", "8")),
+    )
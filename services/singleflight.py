@@ -0,0 +1,66 @@
+"""
+Request coalescing ("single flight").
+
+Concurrent calls with the same key share one execution: the first caller
+runs the function, the others wait for it and receive the same result (or
+exception). Nothing is cached once the call completes.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent in-flight calls by key.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn, unless a call with the same key is already in flight, in which case wait for it.
+
+        Args:
+            key: Identity of the call (e.g. (host_url, tenant_id, resource_type))
+            fn: The function to execute
+
+        Returns:
+            The result of fn, shared by every caller of this flight; treat it as read-only
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
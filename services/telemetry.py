@@ -0,0 +1,459 @@
+"""
+Utilisation telemetry and idle detection.
+
+CPU and network samples per resource are binned to the minute and kept in
+one NumPy ring buffer per metric (a float32 row per resource, one column per
+minute of retention). The analysis works on whole matrices: rolling means
+smooth the series, idle minutes are a threshold mask, idle windows are the
+runs in that mask, and averaging the mask per hour of the week gives the
+hours a resource is reliably idle, which become a recommended stop/start
+schedule in the scheduler's cron format.
+
+Samples are keyed "<resource_type>:<key>" (e.g. "ec2:i-0abc", "rds:orders-db")
+and come from JSON/CSV files (TELEMETRY_PATH) or a stand-in HTTP endpoint
+polled in the background (TELEMETRY_ENDPOINT), both using the same layout:
+
+    {"series": [{"key": "ec2:i-0abc", "metric": "cpu",
+                 "timestamps": [1718000000, ...], "values": [3.2, ...]}]}
+
+CSV files have the columns timestamp,key,metric,value.
+"""
+import csv
+import glob
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services import http_pool, jsonlib
+
+logger = logging.getLogger(__name__)
+
+CPU = "cpu"  # percent
+NETWORK = "network"  # bytes per second, in + out
+METRICS = (CPU, NETWORK)
+
+MINUTES_PER_DAY = 1440
+HOURS_PER_WEEK = 168
+# Epoch minute 0 is a Thursday; hour-of-week 0 is Monday 00:00 UTC
+_EPOCH_HOUR_OF_WEEK = 72
+
+
+class MinuteRingBuffer:
+    """
+    The last `capacity` minutes of one metric for many resources.
+    """
+
+    def __init__(self, capacity: int, initial_rows: int = 64):
+        self.capacity = capacity
+        self._rows: Dict[str, int] = {}
+        self._data = np.full((initial_rows, capacity), np.nan, dtype=np.float32)
+        self.latest_minute: Optional[int] = None
+
+    def _row(self, key: str) -> int:
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = len(self._rows)
+            if row >= self._data.shape[0]:
+                grown = np.full((self._data.shape[0] * 2, self.capacity), np.nan, dtype=np.float32)
+                grown[: self._data.shape[0]] = self._data
+                self._data = grown
+        return row
+
+    def _advance(self, minute: int) -> None:
+        # Slots about to be reused still hold data from `capacity` minutes ago
+        if self.latest_minute is None:
+            self.latest_minute = minute
+            return
+        if minute <= self.latest_minute:
+            return
+        if minute - self.latest_minute >= self.capacity:
+            self._data[:] = np.nan
+        else:
+            self._data[:, np.arange(self.latest_minute + 1, minute + 1) % self.capacity] = np.nan
+        self.latest_minute = minute
+
+    def write(self, key: str, minutes: np.ndarray, values: np.ndarray) -> int:
+        """
+        Store one resource's samples (minutes since the epoch), newest value per minute wins.
+
+        Returns:
+            The number of samples kept (older than the retention are dropped)
+        """
+        if not len(minutes):
+            return 0
+        self._advance(int(minutes.max()))
+        keep = minutes > self.latest_minute - self.capacity
+        row = self._row(key)
+        self._data[row, minutes[keep] % self.capacity] = values[keep]
+        return int(keep.sum())
+
+    def window(self, keys: Sequence[str], start_minute: int, end_minute: int) -> np.ndarray:
+        """
+        Values of keys for minutes [start_minute, end_minute), NaN where nothing was recorded.
+        """
+        result = np.full((len(keys), end_minute - start_minute), np.nan, dtype=np.float32)
+        if self.latest_minute is None:
+            return result
+        first_retained = self.latest_minute - self.capacity + 1
+        lo, hi = max(start_minute, first_retained), min(end_minute, self.latest_minute + 1)
+        positions = [(i, self._rows[key]) for i, key in enumerate(keys) if key in self._rows]
+        if lo >= hi or not positions:
+            return result
+        targets, rows = (np.array(p, dtype=np.intp) for p in zip(*positions))
+        columns = np.arange(lo, hi) % self.capacity
+        result[targets, lo - start_minute:hi - start_minute] = self._data[np.ix_(rows, columns)]
+        return result
+
+    def keys(self) -> List[str]:
+        return list(self._rows)
+
+
+class TelemetryStore:
+    """
+    Ring buffers for every metric, safe to ingest into and analyse from different threads.
+    """
+
+    def __init__(self, retention_days: float = 14):
+        self.capacity = int(retention_days * MINUTES_PER_DAY)
+        self._buffers = {metric: MinuteRingBuffer(self.capacity) for metric in METRICS}
+        self._lock = threading.Lock()
+
+    def ingest(self, key: str, metric: str, timestamps: Sequence[float], values: Sequence[float]) -> int:
+        """
+        Add samples of one series.
+
+        Args:
+            key: "<resource_type>:<key>", e.g. "ec2:i-0abc"
+            metric: cpu (percent) or network (bytes per second)
+            timestamps: Epoch seconds of the samples
+            values: Sample values aligned with timestamps
+
+        Returns:
+            The number of samples stored
+        """
+        buffer = self._buffers.get(metric)
+        if buffer is None:
+            raise ValueError(f"Unsupported metric: {metric}")
+        minutes = np.asarray(timestamps, dtype=np.float64) // 60
+        with self._lock:
+            return buffer.write(key, minutes.astype(np.int64), np.asarray(values, dtype=np.float32))
+
+    def ingest_payload(self, payload: Dict[str, Any]) -> int:
+        """
+        Add every series of a {"series": [...]} payload; returns the number of samples stored.
+        """
+        stored = 0
+        for series in payload.get("series", []):
+            try:
+                stored += self.ingest(series["key"], series["metric"], series["timestamps"], series["values"])
+            except (KeyError, ValueError) as e:
+                logger.warning(f"Skipping telemetry series {series.get('key')}: {e}")
+        return stored
+
+    def load_file(self, path: str) -> int:
+        """
+        Ingest a JSON payload file or a CSV file (timestamp,key,metric,value).
+        """
+        if path.endswith(".csv"):
+            grouped: Dict[Tuple[str, str], Tuple[List[float], List[float]]] = {}
+            with open(path, newline="") as f:
+                for row in csv.DictReader(f):
+                    timestamps, values = grouped.setdefault((row["key"], row["metric"]), ([], []))
+                    timestamps.append(float(row["timestamp"]))
+                    values.append(float(row["value"]))
+            return sum(self.ingest(key, metric, ts, vs) for (key, metric), (ts, vs) in grouped.items())
+        with open(path, "rb") as f:
+            return self.ingest_payload(jsonlib.loads(f.read()))
+
+    def fetch(self, url: str, timeout: float = 30) -> int:
+        """
+        Ingest the payload served by a telemetry endpoint.
+        """
+        response = http_pool.session().get(url, timeout=timeout)
+        response.raise_for_status()
+        return self.ingest_payload(jsonlib.loads(response.content))
+
+    @property
+    def latest_minute(self) -> Optional[int]:
+        minutes = [b.latest_minute for b in self._buffers.values() if b.latest_minute is not None]
+        return max(minutes) if minutes else None
+
+    def keys(self, metric: Optional[str] = None) -> List[str]:
+        """
+        Keys with telemetry for metric (any metric when None).
+        """
+        with self._lock:
+            buffers = [self._buffers[metric]] if metric else self._buffers.values()
+            return sorted({key for buffer in buffers for key in buffer.keys()})
+
+    def window(self, metric: str, keys: Sequence[str], start_minute: int, end_minute: int) -> np.ndarray:
+        with self._lock:
+            return self._buffers[metric].window(keys, start_minute, end_minute)
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Trailing mean over `window` columns of each row, ignoring NaN (NaN when a window has no data).
+    """
+    valid = ~np.isnan(values)
+    sums = np.nan_to_num(values, nan=0.0).astype(np.float64)
+    np.cumsum(sums, axis=1, out=sums)
+    counts = np.cumsum(valid, axis=1, dtype=np.int32)
+    sums[:, window:] -= sums[:, :-window]
+    counts[:, window:] -= counts[:, :-window]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sums /= counts
+    return sums
+
+
+def find_runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Runs of True in each row of a boolean matrix.
+
+    Returns:
+        (rows, starts, lengths) of every run, ordered by row then start column
+    """
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return rows, starts, ends - starts
+
+
+@dataclass
+class IdleReport:
+    key: str
+    idle_fraction: float  # share of the analysed minutes that were idle
+    idle_windows: List[Tuple[float, float]] = field(default_factory=list)  # recent (start, end) epoch seconds
+    weekly_idle: List[Tuple[int, int]] = field(default_factory=list)  # (hour of week, hours), Monday 00:00 UTC = 0
+    stop_crons: List[str] = field(default_factory=list)
+    start_crons: List[str] = field(default_factory=list)
+
+    @property
+    def resource_type(self) -> str:
+        return self.key.partition(":")[0]
+
+    @property
+    def resource_key(self) -> str:
+        return self.key.partition(":")[2]
+
+    @property
+    def always_idle(self) -> bool:
+        return self.weekly_idle_hours >= HOURS_PER_WEEK
+
+    @property
+    def weekly_idle_hours(self) -> int:
+        return sum(hours for _, hours in self.weekly_idle)
+
+    def to_rules(self, host_url: str, tenant_id: str, tenant_name: str = "") -> List[Dict[str, Any]]:
+        """
+        The recommended schedule as scheduler rules (see services.scheduler.load_rules).
+        """
+        rules = []
+        for action, crons in (("stop", self.stop_crons), ("start", self.start_crons)):
+            for index, cron in enumerate(crons):
+                rules.append({
+                    "rule_id": f"idle-{action}-{self.resource_key}-{index}",
+                    "cron": cron,
+                    "action": action,
+                    "host_url": host_url,
+                    "tenant_id": tenant_id,
+                    "tenant_name": tenant_name,
+                    "resource_type": self.resource_type,
+                    "name_pattern": self.resource_key,
+                })
+        return rules
+
+
+def _weekly_runs(idle_hours: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    Runs of idle hours in one week, joining a run at the end of Sunday with one at the start of Monday.
+    """
+    if idle_hours.all():
+        return [(0, HOURS_PER_WEEK)]
+    _, starts, lengths = find_runs(idle_hours[np.newaxis, :])
+    runs = list(zip(starts.tolist(), lengths.tolist()))
+    if len(runs) > 1 and runs[0][0] == 0 and runs[-1][0] + runs[-1][1] == HOURS_PER_WEEK:
+        first = runs.pop(0)
+        start, length = runs.pop()
+        runs.append((start, length + first[1]))
+    return runs
+
+
+def _crons(hours_of_week: List[int]) -> List[str]:
+    """
+    Cron expressions firing at each hour of week, one per hour of day (weekdays combined).
+    """
+    days_by_hour: Dict[int, List[int]] = {}
+    for hour_of_week in hours_of_week:
+        day, hour = divmod(hour_of_week % HOURS_PER_WEEK, 24)
+        # Monday is day 0 here and 1 in cron, Sunday 6 here and 0 in cron
+        days_by_hour.setdefault(hour, []).append((day + 1) % 7)
+    return [
+        f"0 {hour} * * {','.join(str(d) for d in sorted(set(days)))}"
+        for hour, days in sorted(days_by_hour.items())
+    ]
+
+
+def analyze_idle(
+    store: TelemetryStore,
+    keys: Sequence[str],
+    days: float = 14,
+    cpu_threshold: float = 5.0,
+    network_threshold: float = 5000.0,
+    smoothing_minutes: int = 15,
+    min_idle_minutes: int = 60,
+    min_idle_share: float = 0.9,
+    min_schedule_hours: int = 4,
+    max_windows: int = 5,
+) -> List[IdleReport]:
+    """
+    Find idle windows and recommend stop/start schedules for keys.
+
+    Args:
+        store: Where the telemetry is kept
+        keys: "<resource_type>:<key>" of the resources to analyse
+        days: How much history to analyse, ending at the last complete hour
+        cpu_threshold: Smoothed CPU percent under which a minute is idle
+        network_threshold: Smoothed bytes per second under which a minute is idle (ignored without data)
+        smoothing_minutes: Width of the rolling mean applied before thresholding
+        min_idle_minutes: Shortest run of idle minutes reported as an idle window
+        min_idle_share: Share of the weeks with telemetry for an hour of the week it must be idle in to be scheduled
+        min_schedule_hours: Shortest weekly idle period turned into a stop/start schedule
+        max_windows: Number of most recent idle windows kept per report
+
+    Returns:
+        One report per key with telemetry, in the order of keys
+    """
+    latest = store.latest_minute
+    if latest is None or not keys:
+        return []
+    days = min(days, store.capacity / MINUTES_PER_DAY)
+    end = ((latest + 1) // 60) * 60  # exclusive, last complete hour
+    start = end - int(days * MINUTES_PER_DAY) // 60 * 60
+    keys = list(keys)
+
+    cpu = store.window(CPU, keys, start, end)
+    observed = ~np.isnan(cpu)
+    has_data = observed.any(axis=1)
+
+    with np.errstate(invalid="ignore"):
+        idle = observed & (rolling_mean(cpu, smoothing_minutes) < cpu_threshold)
+        # Network only vetoes idleness where it was reported
+        reported = set(store.keys(NETWORK))
+        rows = [row for row, key in enumerate(keys) if key in reported]
+        if rows:
+            network = store.window(NETWORK, [keys[row] for row in rows], start, end)
+            network_mean = rolling_mean(network, smoothing_minutes)
+            idle[rows] &= np.isnan(network_mean) | (network_mean < network_threshold)
+
+    observed_minutes = observed.sum(axis=1)
+    idle_share = np.divide(idle.sum(axis=1), observed_minutes, out=np.zeros(len(keys)), where=observed_minutes > 0)
+
+    # Idle windows: runs of idle minutes
+    rows, run_starts, run_lengths = find_runs(idle)
+    long_enough = run_lengths >= min_idle_minutes
+    windows: Dict[int, List[Tuple[float, float]]] = {}
+    for row, run_start, length in zip(rows[long_enough].tolist(), run_starts[long_enough].tolist(),
+                                      run_lengths[long_enough].tolist()):
+        begin = (start + run_start) * 60.0
+        windows.setdefault(row, []).append((begin, begin + length * 60.0))
+
+    # Weekly profile: share of idle minutes per hour of the week, averaged over the analysed weeks
+    # that have telemetry for that hour (hours without any are never scheduled)
+    hours = idle.shape[1] // 60
+    schedules: Dict[int, List[Tuple[int, int]]] = {}
+    if hours >= HOURS_PER_WEEK:
+        observed_per_hour = observed.reshape(len(keys), hours, 60).sum(axis=2)
+        idle_per_hour = idle.reshape(len(keys), hours, 60).sum(axis=2)
+        hourly = np.divide(idle_per_hour, observed_per_hour, out=np.zeros(idle_per_hour.shape),
+                           where=observed_per_hour > 0)
+        hour_of_week = (start // 60 + np.arange(hours) + _EPOCH_HOUR_OF_WEEK) % HOURS_PER_WEEK
+        order = np.argsort(hour_of_week, kind="stable")
+        counts = np.bincount(hour_of_week, minlength=HOURS_PER_WEEK)
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        idle_weeks = np.add.reduceat(hourly[:, order], offsets, axis=1)
+        observed_weeks = np.add.reduceat((observed_per_hour > 0)[:, order].astype(np.int64), offsets, axis=1)
+        profile = np.divide(idle_weeks, observed_weeks, out=np.zeros(idle_weeks.shape), where=observed_weeks > 0)
+        idle_hours = (observed_weeks > 0) & (profile >= min_idle_share)
+        for row in np.nonzero(idle_hours.any(axis=1) & has_data)[0].tolist():
+            runs = [run for run in _weekly_runs(idle_hours[row]) if run[1] >= min_schedule_hours]
+            if runs:
+                schedules[row] = runs
+
+    reports = []
+    for row, key in enumerate(keys):
+        if not has_data[row]:
+            continue
+        weekly_idle = schedules.get(row, [])
+        report = IdleReport(
+            key=key,
+            idle_fraction=float(idle_share[row]),
+            idle_windows=windows.get(row, [])[-max_windows:],
+            weekly_idle=weekly_idle,
+        )
+        if weekly_idle and not report.always_idle:
+            report.stop_crons = _crons([hour for hour, _ in weekly_idle])
+            report.start_crons = _crons([hour + length for hour, length in weekly_idle])
+        elif report.always_idle:
+            report.stop_crons = _crons([0])
+        reports.append(report)
+    return reports
+
+
+class TelemetryPoller:
+    """
+    Periodically ingests the payload served by a telemetry endpoint.
+    """
+
+    def __init__(self, store: TelemetryStore, url: str, interval: float = 300):
+        self.store = store
+        self.url = url
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="telemetry-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                stored = self.store.fetch(self.url)
+                logger.info(f"Ingested {stored} telemetry samples from {self.url}")
+            except Exception as e:
+                logger.error(f"Telemetry fetch from {self.url} failed: {e}")
+            self._stopped.wait(self.interval)
+
+
+def load_from_env(store: TelemetryStore) -> Optional[TelemetryPoller]:
+    """
+    Ingest TELEMETRY_PATH (a file or a directory of .json/.csv files) and build a poller
+    for TELEMETRY_ENDPOINT (None when it is not set).
+    """
+    path = os.getenv("TELEMETRY_PATH")
+    if path:
+        files = sorted(glob.glob(os.path.join(path, "*.json")) + glob.glob(os.path.join(path, "*.csv"))) \
+            if os.path.isdir(path) else [path]
+        for file_path in files:
+            try:
+                logger.info(f"Ingested {store.load_file(file_path)} telemetry samples from {file_path}")
+            except Exception as e:
+                logger.error(f"Could not ingest telemetry file {file_path}: {e}")
+    url = os.getenv("TELEMETRY_ENDPOINT")
+    if not url:
+        return None
+    return TelemetryPoller(store, url, interval=float(os.getenv("TELEMETRY_POLL_INTERVAL", "300")))
+
+
+# Process-wide telemetry, TELEMETRY_RETENTION_DAYS of minute data per resource
+default_store = TelemetryStore(retention_days=float(os.getenv("TELEMETRY_RETENTION_DAYS", "14")))